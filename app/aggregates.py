@@ -0,0 +1,53 @@
+"""Running per-group aggregates maintained by a Table as rows change."""
+
+from typing import Any, Dict, List
+
+
+class RatingAggregate:
+    """Count, sum, 1-5 histogram and flagged count of ratings, per group.
+
+    Kept up to date by the owning table on every insert, update and delete,
+    so a group's summary costs O(1) instead of a scan of its rows.
+    """
+
+    def __init__(self, group_field: str, rating_field: str = "rating", flag_field: str = "verified_purchase"):
+        self.group_field = group_field
+        self.rating_field = rating_field
+        self.flag_field = flag_field
+        # group -> [count, sum, flagged, ratings of 1, ..., ratings of 5]
+        self.groups: Dict[Any, List[int]] = {}
+
+    def _apply(self, row: Dict, sign: int) -> None:
+        group = row.get(self.group_field)
+        if group is None:
+            return
+        stats = self.groups.get(group)
+        if stats is None:
+            stats = self.groups[group] = [0] * 8
+        rating = row[self.rating_field]
+        stats[0] += sign
+        stats[1] += sign * rating
+        stats[2] += sign * bool(row.get(self.flag_field))
+        stats[2 + rating] += sign
+        if not stats[0]:
+            del self.groups[group]
+
+    def add(self, row: Dict) -> None:
+        self._apply(row, 1)
+
+    def remove(self, row: Dict) -> None:
+        self._apply(row, -1)
+
+    def clear(self) -> None:
+        self.groups.clear()
+
+    def summary(self, group: Any) -> Dict[str, Any]:
+        """Aggregates for one group; zeros if it has no rows."""
+        count, total, flagged, *histogram = self.groups.get(group, [0] * 8)
+        return {
+            "review_count": count,
+            "rating_sum": total,
+            "average_rating": round(total / count, 2) if count else None,
+            "rating_histogram": {str(rating): n for rating, n in enumerate(histogram, 1)},
+            "verified_count": flagged,
+        }
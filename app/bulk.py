@@ -0,0 +1,164 @@
+"""Bulk ingest and export of table rows as JSON arrays or NDJSON.
+
+Ingested rows are validated in chunks with a TypeAdapter over the whole list; NDJSON
+chunks go straight from bytes to models. Only a chunk that fails validation
+is re-checked row by row to find the bad rows.
+"""
+
+import asyncio
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.database import Table
+from app.serialization import row_encoder
+
+CHUNK_ROWS = 10_000
+EXPORT_BATCH_ROWS = 1_000
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+
+def bulk_body_schema(model: type[BaseModel]) -> Dict[str, Any]:
+    """OpenAPI requestBody for a bulk endpoint taking rows of `model`."""
+    items = {"type": "array", "items": {"$ref": f"#/components/schemas/{model.__name__}"}}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": items},
+                "application/x-ndjson": {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}},
+            },
+        }
+    }
+
+
+async def _ndjson_chunks(request: Request) -> AsyncIterator[List[bytes]]:
+    """Split a streamed NDJSON body into chunks of at most CHUNK_ROWS lines."""
+    pending = b""
+    lines: List[bytes] = []
+    async for data in request.stream():
+        pending += data
+        *complete, pending = pending.split(b"\n")
+        lines.extend(line for line in complete if line.strip())
+        while len(lines) >= CHUNK_ROWS:
+            yield lines[:CHUNK_ROWS]
+            lines = lines[CHUNK_ROWS:]
+    if pending.strip():
+        lines.append(pending)
+    if lines:
+        yield lines
+
+
+def _validate_chunk(
+    adapter: TypeAdapter, lines: List[bytes] | None, items: List[Any] | None
+) -> Tuple[List[Tuple[int, BaseModel]], List[Tuple[int, str]]]:
+    """Validate one chunk; return (position, model) and (position, error) pairs.
+
+    A chunk is given either as raw NDJSON `lines` or as already-parsed `items`.
+    """
+    if lines is not None:
+        try:
+            return list(enumerate(adapter.validate_json(b"[" + b",".join(lines) + b"]"))), []
+        except ValueError:
+            pass
+        items, errors = [], []
+        for position, line in enumerate(lines):
+            try:
+                items.append((position, json.loads(line)))
+            except ValueError as e:
+                errors.append((position, f"Invalid JSON: {e}"))
+    else:
+        try:
+            return list(enumerate(adapter.validate_python(items))), []
+        except ValidationError:
+            pass
+        items, errors = list(enumerate(items)), []
+
+    try:
+        adapter.validate_python([item for _, item in items])
+    except ValidationError as e:
+        bad: Dict[int, str] = {}
+        for error in e.errors():
+            field = ".".join(str(part) for part in error["loc"][1:])
+            bad.setdefault(error["loc"][0], f"{field}: {error['msg']}" if field else error["msg"])
+        errors.extend((items[i][0], message) for i, message in bad.items())
+        items = [item for i, item in enumerate(items) if i not in bad]
+    models = adapter.validate_python([item for _, item in items])
+    errors.sort()
+    return [(position, model) for (position, _), model in zip(items, models)], errors
+
+
+async def ingest(request: Request, adapter: TypeAdapter, table: Table, build_row: Callable[[BaseModel], Dict]) -> Dict:
+    """Validate and insert every row of a bulk request body, one chunk at a time.
+
+    Returns a report with row counts, the id ranges assigned and the first
+    MAX_REPORTED_ERRORS per-row errors, by zero-based row number.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        chunks = ((lines, None) async for lines in _ndjson_chunks(request))
+    else:
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+        async def array_chunks():
+            for start in range(0, len(body), CHUNK_ROWS):
+                yield None, body[start:start + CHUNK_ROWS]
+        chunks = array_chunks()
+
+    received = created = failed = 0
+    id_ranges: List[List[int]] = []
+    errors: List[Dict] = []
+    async for lines, items in chunks:
+        size = len(lines if lines is not None else items)
+        valid, invalid = _validate_chunk(adapter, lines, items)
+        inserted, rejected = table.insert_many([build_row(model) for _, model in valid])
+        invalid.extend((valid[i][0], message) for i, message in rejected)
+
+        if inserted:
+            first, last = inserted[0][table.primary_key], inserted[-1][table.primary_key]
+            if id_ranges and id_ranges[-1][1] + 1 == first:
+                id_ranges[-1][1] = last
+            else:
+                id_ranges.append([first, last])
+        for position, message in sorted(invalid)[:MAX_REPORTED_ERRORS - len(errors)]:
+            errors.append({"row": received + position, "error": message})
+        received += size
+        created += len(inserted)
+        failed += len(invalid)
+        # Let other requests run between chunks of a large upload.
+        await asyncio.sleep(0)
+
+    return {
+        "received": received,
+        "created": created,
+        "failed": failed,
+        "id_ranges": id_ranges,
+        "errors": errors,
+    }
+
+
+async def export_ndjson(table: Table, model: type[BaseModel]) -> AsyncIterator[bytes]:
+    """Yield every row of `table` as NDJSON, EXPORT_BATCH_ROWS rows per chunk.
+
+    Each batch resumes after the last id sent, so memory stays constant and
+    rows written or deleted mid-export never break the iteration.
+    """
+    encode = row_encoder(model)
+    after = None
+    while True:
+        rows = [table.rows[row_id] for row_id in islice(table.ids_after(after), EXPORT_BATCH_ROWS)]
+        if not rows:
+            return
+        after = rows[-1][table.primary_key]
+        yield b"".join(encode(row) + b"\n" for row in rows)
+        await asyncio.sleep(0)
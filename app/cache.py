@@ -0,0 +1,194 @@
+"""In-process cache of serialized GET responses with tag-based invalidation."""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from app import config
+
+Key = Tuple[str, str]
+
+
+class CachedResponse:
+    """Body, headers and ETag of a cached 200 response."""
+
+    __slots__ = ("body", "headers", "etag", "expires", "tags")
+
+    def __init__(self, body: bytes, headers: List[Tuple[bytes, bytes]], tags: List[str], expires: float):
+        self.body = body
+        self.etag = b'"' + hashlib.blake2b(body, digest_size=8).hexdigest().encode() + b'"'
+        self.headers = headers
+        self.tags = tags
+        self.expires = expires
+
+
+class ResponseCache:
+    """LRU cache of responses with a TTL, invalidated by tag.
+
+    Each entry carries tags naming the data it was built from, such as
+    "product:7" or "products". Writers invalidate the tags they touch, which
+    drops exactly the entries built from that data.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Key, CachedResponse]" = OrderedDict()
+        self.by_tag: Dict[str, Set[Key]] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Key) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Key, entry: CachedResponse, version: int) -> None:
+        """Store `entry` unless anything was invalidated since `version` was read."""
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = entry
+            for tag in entry.tags:
+                self.by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every entry carrying any of `tags`."""
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                for key in list(self.by_tag.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self.entries.clear()
+            self.by_tag.clear()
+
+    def _drop(self, key: Key) -> None:
+        entry = self.entries.pop(key)
+        for tag in entry.tags:
+            keys = self.by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_tag[tag]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def _etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    for candidate in if_none_match.split(b","):
+        candidate = candidate.strip()
+        if candidate == b"*" or candidate.removeprefix(b"W/") == etag:
+            return True
+    return False
+
+
+class CacheMiddleware:
+    """Serve cacheable GET routes from a ResponseCache, with ETag support.
+
+    `routes` holds (path regex, route template, function returning the cache
+    tags for a match); other paths pass straight through. The template of a
+    matched route is stored in scope["route_template"], since a response
+    served from the cache never reaches the router. Responses carry an ETag,
+    and a request whose If-None-Match matches it gets an empty 304.
+    """
+
+    def __init__(self, app, cache: ResponseCache, routes: Iterable[Tuple[str, str, Callable[[re.Match], List[str]]]]):
+        self.app = app
+        self.cache = cache
+        self.routes: List[Tuple[Pattern, str, Callable[[re.Match], List[str]]]] = [
+            (re.compile(pattern), template, tags) for pattern, template, tags in routes
+        ]
+
+    def _match(self, path: str) -> Optional[Tuple[str, List[str]]]:
+        for pattern, template, tags in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                return template, tags(match)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        matched = self._match(scope["path"])
+        if matched is None:
+            return await self.app(scope, receive, send)
+        scope["route_template"], tags = matched
+
+        query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        key = (scope["path"], query)
+        if_none_match = next((value for name, value in scope["headers"] if name == b"if-none-match"), None)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            return await self._send(send, entry, if_none_match, b"HIT")
+
+        version = self.cache.version
+        start: Dict = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            else:
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        if start.get("status") != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+        headers = [(name, value) for name, value in start.get("headers", []) if name not in (b"content-length", b"etag")]
+        entry = CachedResponse(body, headers, tags, time.monotonic() + self.cache.ttl)
+        self.cache.put(key, entry, version)
+        await self._send(send, entry, if_none_match, b"MISS")
+
+    async def _send(self, send, entry: CachedResponse, if_none_match: Optional[bytes], outcome: bytes) -> None:
+        headers = entry.headers + [
+            (b"etag", entry.etag),
+            (b"cache-control", b"no-cache"),
+            (b"x-cache", outcome),
+        ]
+        if if_none_match is not None and _etag_matches(if_none_match, entry.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers.append((b"content-length", str(len(entry.body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+response_cache = ResponseCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL)
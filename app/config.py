@@ -0,0 +1,81 @@
+"""Runtime configuration, read from environment variables."""
+
+import os
+
+# "memory" keeps data in-process; "wal" keeps it in-process but durable
+# through a write-ahead log and snapshots in WAL_DIR; "sqlite" persists it
+# to SQLITE_PATH so several workers can share one database file.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "memory")
+WAL_DIR = os.environ.get("WAL_DIR", "data")
+WAL_FSYNC_INTERVAL = float(os.environ.get("WAL_FSYNC_INTERVAL", "0.01"))
+WAL_SNAPSHOT_EVERY = int(os.environ.get("WAL_SNAPSHOT_EVERY", "100000"))
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "preman.db")
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "4"))
+
+# Ids each worker reserves at a time from shared storage.
+ID_BLOCK_SIZE = int(os.environ.get("ID_BLOCK_SIZE", "100"))
+
+# Cached GET responses kept per worker, and how long each stays fresh (seconds).
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "60"))
+
+# Encode stored rows on read endpoints directly with pydantic-core, skipping
+# response_model validation. Off by default.
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+# Validate JSON request bodies straight from the raw bytes with
+# pydantic-core instead of parsing them to dicts first. On by default.
+RAW_JSON_BODIES = os.environ.get("RAW_JSON_BODIES", "1") == "1"
+
+# Token expected in the X-Admin-Token header of /admin endpoints; they are
+# disabled when unset.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Carts not modified for CART_TTL seconds are deleted by a sweeper that runs
+# every CART_SWEEP_INTERVAL seconds.
+CART_TTL = float(os.environ.get("CART_TTL", "86400"))
+CART_SWEEP_INTERVAL = float(os.environ.get("CART_SWEEP_INTERVAL", "60"))
+
+# Secret that signs access tokens; every worker must share it. When unset,
+# each process makes up its own and tokens die with it.
+AUTH_SECRET = os.environ.get("AUTH_SECRET", "")
+# Lifetime of access tokens, and how many verified tokens each worker caches (seconds, entries).
+TOKEN_TTL = float(os.environ.get("TOKEN_TTL", "3600"))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+# Threads hashing passwords, which bounds the CPU logins can take per worker.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Requests a second each client may make, across all routes and to the
+# login/register and order-placing routes; bursts of twice that are let
+# through. A client is the user of a valid bearer token, else the peer
+# address. 0 turns a limit off; all are off by default.
+RATE_LIMIT = float(os.environ.get("RATE_LIMIT", "0"))
+LOGIN_RATE_LIMIT = float(os.environ.get("LOGIN_RATE_LIMIT", "0"))
+ORDER_RATE_LIMIT = float(os.environ.get("ORDER_RATE_LIMIT", "0"))
+# Clients tracked per limit; past this the least recently seen are forgotten.
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "100000"))
+
+# Requests are answered 503 at once while MAX_IN_FLIGHT are being handled
+# or the event loop runs timers over MAX_LOOP_LAG seconds late. 0 turns a
+# check off; both are off by default.
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "0"))
+MAX_LOOP_LAG = float(os.environ.get("MAX_LOOP_LAG", "0"))
+
+# Notifications wait in a bounded queue per channel (email, SMS, push) and
+# are handed to its sink in batches of up to NOTIFICATION_BATCH_SIZE,
+# gathered for at most NOTIFICATION_BATCH_WAIT seconds. Failed batches are
+# retried NOTIFICATION_MAX_RETRIES times, backing off from
+# NOTIFICATION_RETRY_BACKOFF seconds. On shutdown queued notifications get
+# NOTIFICATION_DRAIN_TIMEOUT seconds to go out.
+NOTIFICATION_QUEUE_SIZE = int(os.environ.get("NOTIFICATION_QUEUE_SIZE", "10000"))
+NOTIFICATION_BATCH_SIZE = int(os.environ.get("NOTIFICATION_BATCH_SIZE", "100"))
+NOTIFICATION_BATCH_WAIT = float(os.environ.get("NOTIFICATION_BATCH_WAIT", "0.05"))
+NOTIFICATION_MAX_RETRIES = int(os.environ.get("NOTIFICATION_MAX_RETRIES", "3"))
+NOTIFICATION_RETRY_BACKOFF = float(os.environ.get("NOTIFICATION_RETRY_BACKOFF", "0.1"))
+NOTIFICATION_DRAIN_TIMEOUT = float(os.environ.get("NOTIFICATION_DRAIN_TIMEOUT", "5"))
+# Local stand-in every channel delivers to: "memory" keeps the last
+# deliveries, "log" also logs them. Each batch takes NOTIFICATION_SINK_LATENCY
+# seconds and fails with probability NOTIFICATION_SINK_FAILURE_RATE.
+NOTIFICATION_SINK = os.environ.get("NOTIFICATION_SINK", "memory")
+NOTIFICATION_SINK_LATENCY = float(os.environ.get("NOTIFICATION_SINK_LATENCY", "0"))
+NOTIFICATION_SINK_FAILURE_RATE = float(os.environ.get("NOTIFICATION_SINK_FAILURE_RATE", "0"))
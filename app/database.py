@@ -1,27 +1,731 @@
-"""In-memory database for demo purposes."""
+"""In-memory tables and indexes, optionally persisted through a storage backend."""
 
-from typing import Dict, List
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
-# In-memory storage
-users_db: List[Dict] = []
-products_db: List[Dict] = []
-addresses_db: List[Dict] = []
-reviews_db: List[Dict] = []
-carts_db: List[Dict] = []
+from app import config
+from app.aggregates import RatingAggregate
+from app.search import TrigramIndex
+from app.storage import ConflictError, LogStorage, MemoryStorage, SQLiteStorage, Storage
 
-# ID counters
-next_user_id = 1
-next_product_id = 1
-next_address_id = 1
-next_review_id = 1
-next_cart_id = 1
+
+class DuplicateKeyError(ValueError):
+    """Raised when a write would violate a primary or unique key."""
+
+
+class Index:
+    """Secondary index mapping a field value to the ids of rows holding it.
+
+    Ids for each value are kept in an insertion-ordered dict, so rows found
+    through a non-unique index come back in id order. None is not indexed.
+    """
+
+    kind = "hash"
+
+    def __init__(self, field: str, unique: bool = False):
+        self.field = field
+        self.unique = unique
+        self.entries: Dict[Any, Dict[int, None]] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct values indexed."""
+        return len(self.entries)
+
+    def lookup(self, value: Any) -> List[int]:
+        """Return the ids of rows whose field equals `value`."""
+        return list(self.entries.get(value, ()))
+
+    def check(self, value: Any, row_id: int) -> None:
+        """Raise if indexing `value` for `row_id` would break uniqueness."""
+        if not self.unique or value is None:
+            return
+        ids = self.entries.get(value)
+        if ids and row_id not in ids:
+            raise DuplicateKeyError(f"Duplicate {self.field} {value!r}")
+
+    def add(self, value: Any, row_id: int) -> None:
+        if value is not None:
+            self.entries.setdefault(value, {})[row_id] = None
+
+    def add_many(self, pairs: List[Tuple[Any, int]]) -> None:
+        for value, row_id in pairs:
+            self.add(value, row_id)
+
+    def remove(self, value: Any, row_id: int) -> None:
+        ids = self.entries.get(value)
+        if ids is None:
+            return
+        ids.pop(row_id, None)
+        if not ids:
+            del self.entries[value]
+
+
+class SortedIndex:
+    """Ordered index of (value, id) pairs supporting bisect range scans."""
+
+    kind = "sorted"
+    unique = False
+
+    def __init__(self, field: str):
+        self.field = field
+        self.keys: List[Tuple[Any, int]] = []
+
+    def __len__(self) -> int:
+        """Number of (value, id) entries."""
+        return len(self.keys)
+
+    def lookup(self, value: Any) -> List[int]:
+        """Return the ids of rows whose field equals `value`, in id order."""
+        return list(self.range(value, value))
+
+    def range(self, low: Any = None, high: Any = None, after: Tuple[Any, int] | None = None) -> Iterator[int]:
+        """Yield ids with low <= value <= high, ordered by (value, id).
+
+        If `after` is a (value, id) key, only entries past it are yielded.
+        """
+        start = 0 if low is None else bisect_left(self.keys, (low,))
+        if after is not None:
+            start = max(start, bisect_right(self.keys, tuple(after)))
+        end = len(self.keys) if high is None else bisect_right(self.keys, (high, float("inf")))
+        for i in range(start, end):
+            yield self.keys[i][1]
+
+    def check(self, value: Any, row_id: int) -> None:
+        pass
+
+    def add(self, value: Any, row_id: int) -> None:
+        if value is not None:
+            insort(self.keys, (value, row_id))
+
+    def add_many(self, pairs: List[Tuple[Any, int]]) -> None:
+        # One sort over two presorted runs is linear, unlike repeated insort.
+        self.keys.extend(sorted(pair for pair in pairs if pair[0] is not None))
+        self.keys.sort()
+
+    def remove(self, value: Any, row_id: int) -> None:
+        i = bisect_left(self.keys, (value, row_id))
+        if i < len(self.keys) and self.keys[i] == (value, row_id):
+            del self.keys[i]
+
+
+class BitmapIndex:
+    """One bitmap of ids per value, for low-cardinality fields like flags."""
+
+    kind = "bitmap"
+    unique = False
+
+    def __init__(self, field: str):
+        self.field = field
+        self.bitmaps: Dict[Any, bytearray] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct values with a bitmap."""
+        return len(self.bitmaps)
+
+    def contains(self, value: Any, row_id: int) -> bool:
+        """Whether the row with `row_id` has `value` in this field."""
+        bits = self.bitmaps.get(value)
+        byte = row_id >> 3
+        return bits is not None and byte < len(bits) and bool(bits[byte] & (1 << (row_id & 7)))
+
+    def ids(self, value: Any, start: int = 0) -> Iterator[int]:
+        """Yield ids >= `start` of rows with `value`, in id order."""
+        bits = self.bitmaps.get(value, b"")
+        for byte_index in range(start >> 3, len(bits)):
+            byte = bits[byte_index]
+            if byte:
+                base = byte_index << 3
+                for bit in range(8):
+                    if byte & (1 << bit) and base + bit >= start:
+                        yield base + bit
+
+    def check(self, value: Any, row_id: int) -> None:
+        pass
+
+    def add(self, value: Any, row_id: int) -> None:
+        if value is None:
+            return
+        bits = self.bitmaps.setdefault(value, bytearray())
+        byte = row_id >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(max(byte + 1 - len(bits), len(bits))))
+        bits[byte] |= 1 << (row_id & 7)
+
+    def add_many(self, pairs: List[Tuple[Any, int]]) -> None:
+        for value, row_id in pairs:
+            self.add(value, row_id)
+
+    def remove(self, value: Any, row_id: int) -> None:
+        if self.contains(value, row_id):
+            self.bitmaps[value][row_id >> 3] &= ~(1 << (row_id & 7)) & 0xFF
+
+
+class IdAllocator:
+    """Hands out primary keys for one table.
+
+    Ids come from a local counter, or, when the storage is shared between
+    processes, from blocks of `block_size` ids reserved in storage, so
+    workers draw disjoint ranges without a round trip per insert. Safe to
+    call from any thread.
+    """
+
+    def __init__(self, table: "Table", block_size: int = 100):
+        self.table = table
+        self.block_size = block_size
+        self.next = 1
+        self.end = 1
+        self._lock = threading.Lock()
+
+    def allocate(self, count: int = 1) -> int:
+        """Return the first of `count` consecutive unused ids."""
+        storage = self.table.storage
+        with self._lock:
+            if storage.allocates_ids and self.end - self.next < count:
+                size = max(count, self.block_size)
+                self.next = storage.reserve_ids(self.table, size)
+                self.end = self.next + size
+            start = self.next
+            self.next += count
+            return start
+
+    def discard(self) -> None:
+        """Drop the rest of the reserved block; the next id starts a new one."""
+        with self._lock:
+            self.end = self.next
+
+    def advance(self, next_id: int) -> None:
+        """Make sure locally allocated ids start at `next_id` or later."""
+        if self.table.storage.allocates_ids:
+            return
+        with self._lock:
+            self.next = max(self.next, next_id)
+
+
+class Table:
+    """In-memory table of row dicts indexed by primary key.
+
+    Rows are kept in a dict keyed by id, so lookups, updates and deletes are
+    O(1). Ids are assigned in increasing order, so iteration follows id order.
+    A sorted list of ids supports seeking past a given id for keyset
+    pagination; deleted ids are left in it and compacted away in bulk.
+
+    Reads are always served from memory. Writes are checked against the
+    in-memory indexes, persisted through `storage`, then applied in memory,
+    all while holding `lock`; tables sharing a lock write one at a time.
+    Listeners registered with `on_change` are called with the ids of every
+    write applied, local or mirrored from another process. Aggregates added
+    with `add_aggregate` see every row as it is inserted, updated or removed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        primary_key: str = "id",
+        storage: Storage | None = None,
+        lock: "threading.RLock | None" = None,
+        id_block_size: int = 100,
+    ):
+        self.name = name
+        self.primary_key = primary_key
+        self.storage = storage or MemoryStorage()
+        self.lock = lock or threading.RLock()
+        self.ids = IdAllocator(self, id_block_size)
+        self.rows: Dict[int, Dict] = {}
+        self.indexes: Dict[str, Index | SortedIndex | BitmapIndex | TrigramIndex] = {}
+        self._order: List[int] = []
+        self._stale = 0
+        self.listeners: List[Callable[[List[int]], None]] = []
+        self.aggregates: List[RatingAggregate] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.rows.values())
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self.rows
+
+    def add_index(self, field: str, unique: bool = False, kind: str = "hash"):
+        """Create a secondary index on `field` and backfill existing rows.
+
+        `kind` is "hash" for equality lookups, "sorted" for range scans,
+        "bitmap" for low-cardinality flags or "text" for substring search.
+        """
+        if kind == "sorted":
+            index = SortedIndex(field)
+        elif kind == "bitmap":
+            index = BitmapIndex(field)
+        elif kind == "text":
+            index = TrigramIndex(field)
+        else:
+            index = Index(field, unique)
+        for row_id, row in self.rows.items():
+            index.check(row.get(field), row_id)
+            index.add(row.get(field), row_id)
+        self.indexes[field] = index
+        return index
+
+    def add_aggregate(self, aggregate: RatingAggregate) -> RatingAggregate:
+        """Maintain `aggregate` over this table's rows, backfilling existing ones."""
+        for row in self.rows.values():
+            aggregate.add(row)
+        self.aggregates.append(aggregate)
+        return aggregate
+
+    def on_change(self, listener: Callable[[List[int]], None]) -> None:
+        """Call `listener` with the ids of rows written after each write."""
+        self.listeners.append(listener)
+
+    def _notify(self, ids: List[int]) -> None:
+        for listener in self.listeners:
+            listener(ids)
+
+    def open(self) -> None:
+        """Create this table in storage and load the rows persisted there."""
+        with self.lock:
+            self._apply_insert_many(list(self.storage.attach(self)))
+
+    def reload(self) -> None:
+        """Discard in-memory rows and load them again from storage."""
+        with self.lock:
+            self.rows.clear()
+            self._order = []
+            self._stale = 0
+            for field, index in list(self.indexes.items()):
+                self.add_index(field, index.unique, index.kind)
+            for aggregate in self.aggregates:
+                aggregate.clear()
+            self._apply_insert_many(list(self.storage.load(self)))
+            self._notify(list(self.rows))
+
+    def next_id(self) -> int:
+        """Allocate the next primary key for this table."""
+        return self.ids.allocate(1)
+
+    def reserve_ids(self, count: int) -> int:
+        """Allocate `count` consecutive primary keys and return the first."""
+        return self.ids.allocate(count)
+
+    def get(self, row_id: int) -> Dict | None:
+        """Get a row by primary key."""
+        return self.rows.get(row_id)
+
+    def ids_after(self, row_id: int | None = None) -> Iterator[int]:
+        """Yield live ids greater than `row_id` in ascending order."""
+        order = self._order
+        start = 0 if row_id is None else bisect_right(order, row_id)
+        for i in range(start, len(order)):
+            if order[i] in self.rows:
+                yield order[i]
+
+    def find(self, field: str, value: Any) -> List[Dict]:
+        """Return rows whose indexed `field` equals `value`, in id order."""
+        return [self.rows[row_id] for row_id in self.indexes[field].lookup(value)]
+
+    def find_one(self, field: str, value: Any) -> Dict | None:
+        """Return the first row whose indexed `field` equals `value`."""
+        ids = self.indexes[field].entries.get(value)
+        return self.rows[next(iter(ids))] if ids else None
+
+    def insert(self, row: Dict) -> Dict:
+        """Insert a new row; its primary key must not already exist."""
+        row_id = row[self.primary_key]
+        with self.lock:
+            if row_id in self.rows:
+                raise DuplicateKeyError(f"Duplicate {self.name} id {row_id}")
+            for index in self.indexes.values():
+                index.check(row.get(index.field), row_id)
+            if self.storage.insert(self, [row]):
+                raise DuplicateKeyError(f"Duplicate key in {self.name}")
+            self._apply_insert(row)
+            self._notify([row_id])
+        self.ids.advance(row_id + 1)
+        return row
+
+    def insert_many(self, rows: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        """Insert a batch of new rows under one contiguous range of fresh ids.
+
+        Rows that would violate a unique index, against the table or earlier
+        rows in the batch, are skipped. Every index is updated once for the
+        whole batch. Returns the inserted rows and (position, message) pairs
+        for the skipped ones.
+        """
+        with self.lock:
+            return self._insert_many(rows)
+
+    def _insert_many(self, rows: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        unique = [index for index in self.indexes.values() if index.unique]
+        seen: Dict[str, set] = {index.field: set() for index in unique}
+        accepted: List[Tuple[int, Dict]] = []
+        rejected: List[Tuple[int, str]] = []
+        for position, row in enumerate(rows):
+            clash = next(
+                (
+                    index for index in unique
+                    if row.get(index.field) is not None
+                    and (row[index.field] in index.entries or row[index.field] in seen[index.field])
+                ),
+                None,
+            )
+            if clash is not None:
+                rejected.append((position, f"Duplicate {clash.field} {row[clash.field]!r}"))
+                continue
+            for index in unique:
+                seen[index.field].add(row.get(index.field))
+            accepted.append((position, row))
+
+        start = self.reserve_ids(len(accepted))
+        for row_id, (_, row) in enumerate(accepted, start):
+            row[self.primary_key] = row_id
+        conflicts = set(self.storage.insert(self, [row for _, row in accepted]))
+        if conflicts:
+            rejected.extend((accepted[i][0], f"Duplicate key in {self.name}") for i in sorted(conflicts))
+            rejected.sort()
+        inserted = [row for i, (_, row) in enumerate(accepted) if i not in conflicts]
+        self._apply_insert_many(inserted)
+        if inserted:
+            self._notify([row[self.primary_key] for row in inserted])
+        return inserted, rejected
+
+    def update(self, row_id: int, changes: Dict) -> Dict | None:
+        """Apply `changes` to a row in place and return it."""
+        with self.lock:
+            row = self.rows.get(row_id)
+            if row is None:
+                return None
+            for field, index in self.indexes.items():
+                if field in changes and changes[field] != row.get(field):
+                    index.check(changes[field], row_id)
+            try:
+                self.storage.update(self, {**row, **changes})
+            except ConflictError as e:
+                raise DuplicateKeyError(str(e))
+            self._apply_update(row_id, changes)
+            self._notify([row_id])
+            return row
+
+    def delete(self, row_id: int) -> Dict | None:
+        """Remove a row and return it."""
+        with self.lock:
+            if row_id not in self.rows:
+                return None
+            self.storage.delete(self, row_id)
+            row = self._apply_delete(row_id)
+            self._notify([row_id])
+            return row
+
+    def adjust(self, field: str, deltas: Dict[int, int], flag: str | None = None) -> Dict[int, int] | None:
+        """Add `deltas` (by row id) to an integer field of several rows, all or nothing.
+
+        Returns the new values, or None, changing nothing, if a row is
+        missing, leaves the field unset, or would drop below zero. Shared
+        storage repeats the check on the stored values, so several processes
+        can never take a value below zero between them. `flag` names a
+        boolean field kept equal to whether the value is above zero.
+        """
+        with self.lock:
+            for row_id, delta in deltas.items():
+                row = self.rows.get(row_id)
+                if row is None or row.get(field) is None or row[field] + delta < 0:
+                    return None
+            values = self.storage.adjust(self, field, deltas, flag)
+            if values is None:
+                return None
+            for row_id, value in values.items():
+                self._apply_update(row_id, {field: value, flag: value > 0} if flag else {field: value})
+            self._notify(list(values))
+            return values
+
+    def expire(self, field: str, before: Any, limit: int = 1000) -> int:
+        """Delete up to `limit` rows whose sorted-indexed `field` is at most `before`.
+
+        Returns the number of rows deleted; call again while it equals `limit`.
+        """
+        with self.lock:
+            ids = list(islice(self.indexes[field].range(None, before), limit))
+            for row_id in ids:
+                self.delete(row_id)
+            return len(ids)
+
+    def apply_change(self, row_id: int, row: Dict | None) -> None:
+        """Mirror a write already persisted by another process."""
+        with self.lock:
+            if row is None:
+                self._apply_delete(row_id)
+            elif row_id in self.rows:
+                self._apply_update(row_id, row)
+            else:
+                self._apply_insert(row)
+            self._notify([row_id])
+        self.ids.advance(row_id + 1)
+
+    def _apply_insert(self, row: Dict) -> None:
+        row_id = row[self.primary_key]
+        self.rows[row_id] = row
+        order = self._order
+        if not order or row_id > order[-1]:
+            order.append(row_id)
+        else:
+            i = bisect_left(order, row_id)
+            if i < len(order) and order[i] == row_id:
+                self._stale -= 1
+            else:
+                order.insert(i, row_id)
+        for index in self.indexes.values():
+            index.add(row.get(index.field), row_id)
+        for aggregate in self.aggregates:
+            aggregate.add(row)
+
+    def _apply_insert_many(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        ids = [row[self.primary_key] for row in rows]
+        if self._order and ids[0] <= self._order[-1]:
+            for row in rows:
+                self._apply_insert(row)
+            return
+        self.rows.update(zip(ids, rows))
+        self._order.extend(ids)
+        self.ids.advance(ids[-1] + 1)
+        for index in self.indexes.values():
+            index.add_many([(row.get(index.field), row_id) for row_id, row in zip(ids, rows)])
+        for aggregate in self.aggregates:
+            for row in rows:
+                aggregate.add(row)
+
+    def _apply_update(self, row_id: int, changes: Dict) -> None:
+        row = self.rows[row_id]
+        for field, index in self.indexes.items():
+            if field in changes and changes[field] != row.get(field):
+                index.remove(row.get(field), row_id)
+                index.add(changes[field], row_id)
+        for aggregate in self.aggregates:
+            aggregate.remove(row)
+        row.update(changes)
+        for aggregate in self.aggregates:
+            aggregate.add(row)
+
+    def _apply_delete(self, row_id: int) -> Dict | None:
+        row = self.rows.pop(row_id, None)
+        if row is not None:
+            for index in self.indexes.values():
+                index.remove(row.get(index.field), row_id)
+            for aggregate in self.aggregates:
+                aggregate.remove(row)
+            self._stale += 1
+            if self._stale > len(self._order) // 2:
+                self._order = [i for i in self._order if i in self.rows]
+                self._stale = 0
+        return row
+
+
+def create_storage() -> Storage:
+    """Build the storage backend selected by config.STORAGE_BACKEND."""
+    if config.STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage(config.SQLITE_PATH, config.SQLITE_POOL_SIZE)
+    if config.STORAGE_BACKEND == "wal":
+        return LogStorage(config.WAL_DIR, config.WAL_FSYNC_INTERVAL, config.WAL_SNAPSHOT_EVERY)
+    if config.STORAGE_BACKEND == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {config.STORAGE_BACKEND!r}")
+
+
+storage = create_storage()
+
+# One lock for all tables, so a write and whatever the storage does around
+# it (such as a WAL snapshot) never interleave with another table's write.
+write_lock = threading.RLock()
+
+
+def _table(name: str, primary_key: str = "id") -> Table:
+    return Table(name, primary_key, storage, write_lock, config.ID_BLOCK_SIZE)
+
+
+# Tables
+users_db = _table("users")
+products_db = _table("products")
+addresses_db = _table("addresses")
+reviews_db = _table("reviews")
+carts_db = _table("carts", primary_key="cart_id")
+orders_db = _table("orders", primary_key="order_id")
+notification_preferences_db = _table("notification_preferences", primary_key="user_id")
+tables: Dict[str, Table] = {
+    t.name: t
+    for t in (users_db, products_db, addresses_db, reviews_db, carts_db, orders_db, notification_preferences_db)
+}
+
+# Fields of a notification preferences row, each holding the channel chosen
+# for that topic.
+NOTIFICATION_TOPICS = ("order_updates", "promotions", "shipping_updates", "marketing")
+
+# Secondary indexes
+users_db.add_index("email", unique=True)
+users_db.add_index("name", kind="text")
+products_db.add_index("price", kind="sorted")
+products_db.add_index("in_stock", kind="bitmap")
+products_db.add_index("name", kind="text")
+products_db.add_index("description", kind="text")
+addresses_db.add_index("user_id")
+reviews_db.add_index("product_id", kind="sorted")
+carts_db.add_index("user_id")
+carts_db.add_index("updated_at", kind="sorted")
+orders_db.add_index("user_id", kind="sorted")
+orders_db.add_index("created_at", kind="sorted")
+orders_db.add_index("idempotency_key", unique=True)
+orders_db.add_index("cart_id", unique=True)
+for _topic in NOTIFICATION_TOPICS:
+    notification_preferences_db.add_index(_topic, kind="bitmap")
+
+# Aggregates
+review_stats = reviews_db.add_aggregate(RatingAggregate("product_id"))
+
+
+def _open_tables() -> None:
+    """Load every table from storage once its indexes and aggregates exist."""
+    for table in tables.values():
+        table.open()
+
+
+_open_tables()
+
+
+def transaction() -> "threading.RLock":
+    """Lock to hold around a read-modify-write that spans several table calls.
+
+    Every table write already holds it, so code inside `with transaction():`
+    sees no interleaved writes from other threads.
+    """
+    return write_lock
+
+
+def sync_tables() -> None:
+    """Apply writes that other processes committed to shared storage."""
+    changes = storage.poll()
+    if changes is None:
+        for table in tables.values():
+            table.reload()
+        return
+    for name, row_id, row in changes:
+        tables[name].apply_change(row_id, row)
+
+
+def reserve_stock(quantities: Dict[int, int]) -> bool:
+    """Take units out of stock for every product in `quantities`, all or nothing.
+
+    Products without a stock level are not limited. Returns False, taking
+    nothing, if any product has fewer units left than asked for.
+    """
+    rows = products_db.rows
+    tracked = {pid: -quantity for pid, quantity in quantities.items() if rows.get(pid, {}).get("stock") is not None}
+    return not tracked or products_db.adjust("stock", tracked, flag="in_stock") is not None
+
+
+def release_stock(quantities: Dict[int, int]) -> None:
+    """Put units taken by `reserve_stock` back into stock."""
+    rows = products_db.rows
+    tracked = {pid: quantity for pid, quantity in quantities.items() if rows.get(pid, {}).get("stock") is not None}
+    if tracked:
+        products_db.adjust("stock", tracked, flag="in_stock")
+
+
+def after_fork() -> None:
+    """Prepare a worker forked after the tables were loaded.
+
+    It gets its own storage connections, and drops the id blocks reserved
+    by the parent so that workers never hand out the same ids.
+    """
+    storage.after_fork()
+    if storage.allocates_ids:
+        for table in tables.values():
+            table.ids.discard()
+
+
+def save_notification_preferences(user_id: int, preferences: Dict) -> Dict:
+    """Store a user's notification preferences, replacing any saved before."""
+    with transaction():
+        if user_id not in notification_preferences_db:
+            try:
+                return notification_preferences_db.insert({"user_id": user_id, **preferences})
+            except DuplicateKeyError:
+                # Another worker saved them first; load its row and overwrite it.
+                sync_tables()
+        return notification_preferences_db.update(user_id, preferences)
+
+
+def get_notification_preferences(user_id: int) -> Dict | None:
+    """Get the notification preferences a user saved, if any."""
+    return notification_preferences_db.get(user_id)
+
+
+def get_subscriber_ids(topic: str, channel: str, default: str) -> Iterator[int]:
+    """Yield ids of users whose channel for `topic` is `channel`, in id order.
+
+    Saved preferences come from the topic's channel index. Users who saved
+    none have `default`, so the users table is only walked when `default`
+    is `channel`.
+    """
+    saved = (user_id for user_id in notification_preferences_db.indexes[topic].ids(channel) if user_id in users_db)
+    if channel != default:
+        return saved
+    unsaved = (user_id for user_id in users_db.ids_after() if user_id not in notification_preferences_db)
+    return heapq.merge(saved, unsaved)
 
 
 def get_user_by_id(user_id: int) -> Dict | None:
-    """Get a user by ID from the in-memory database."""
-    return next((u for u in users_db if u["id"] == user_id), None)
+    """Get a user by ID."""
+    return users_db.get(user_id)
 
 
 def get_product_by_id(product_id: int) -> Dict | None:
-    """Get a product by ID from the in-memory database."""
-    return next((p for p in products_db if p["id"] == product_id), None)
+    """Get a product by ID."""
+    return products_db.get(product_id)
+
+
+def get_products_by_ids(product_ids: List[int]) -> Dict[int, Dict]:
+    """Resolve many product IDs in one pass; missing IDs are left out."""
+    rows = products_db.rows
+    return {pid: rows[pid] for pid in set(product_ids) if pid in rows}
+
+
+def get_user_by_email(email: str) -> Dict | None:
+    """Get a user by email address."""
+    return users_db.find_one("email", email)
+
+
+def get_addresses_for_user(user_id: int) -> List[Dict]:
+    """Get all addresses belonging to a user."""
+    return addresses_db.find("user_id", user_id)
+
+
+def get_review_summary(product_id: int) -> Dict:
+    """Get review count, rating sum, histogram and verified count for a product."""
+    return {"product_id": product_id, **review_stats.summary(product_id)}
+
+
+def get_cart_by_id(cart_id: int) -> Dict | None:
+    """Get a cart by ID."""
+    return carts_db.get(cart_id)
+
+
+def get_carts_for_user(user_id: int) -> List[Dict]:
+    """Get all carts owned by a user."""
+    return carts_db.find("user_id", user_id)
+
+
+def get_order_by_id(order_id: int) -> Dict | None:
+    """Get an order by ID."""
+    return orders_db.get(order_id)
+
+
+def get_order_by_idempotency_key(key: str) -> Dict | None:
+    """Get the order created under an Idempotency-Key."""
+    return orders_db.find_one("idempotency_key", key)
+
+
+def get_order_for_cart(cart_id: int) -> Dict | None:
+    """Get the order a cart was checked out into."""
+    return orders_db.find_one("cart_id", cart_id)
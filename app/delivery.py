@@ -0,0 +1,276 @@
+"""Background delivery of user notifications, batched per channel.
+
+Request handlers call `notify`, which looks up the channel the user chose
+for the topic and appends the notification to that channel's bounded
+in-memory queue; handlers never wait on delivery. `broadcast` fans a
+message out to every subscriber of a topic, channel by channel, reading
+them from the preferences' channel index. One task per channel
+takes up to NOTIFICATION_BATCH_SIZE notifications at a time, waiting at
+most NOTIFICATION_BATCH_WAIT seconds for a batch to fill, and hands each
+batch to the channel's sink in a single call. A batch that fails is
+retried with exponential backoff, then given up on and counted.
+
+The queue bound is the backpressure. While a sink is slow or retrying its
+queue fills, and `submit` drops further notifications and counts them
+(preman_notification_dropped_total) rather than letting memory grow or
+holding up a request. Producers that can afford to wait, like
+`broadcast`, use `put`, which waits for room and never drops. Queues live
+in the worker's memory, so notifications still queued when a worker is
+killed are lost; on a normal shutdown they get NOTIFICATION_DRAIN_TIMEOUT
+seconds to go out.
+
+The sinks are local stand-ins for email, SMS and push providers. They keep
+the last notifications delivered and can be made slow or flaky to exercise
+batching and retries. To plug in a real provider, replace the channel's
+entry in `dispatcher.sinks` before the app starts.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Dict, List
+
+from app import config
+from app.database import get_notification_preferences, get_subscriber_ids
+from app.models import NotificationPreferences, NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch latency buckets, in seconds; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DEFAULT_PREFERENCES = NotificationPreferences().model_dump(mode="json")
+
+
+class Notification:
+    """A message about `topic` for one user on one channel."""
+
+    __slots__ = ("user_id", "channel", "topic", "message", "queued_at")
+
+    def __init__(self, user_id: int, channel: str, topic: str, message: Dict[str, Any]):
+        self.user_id = user_id
+        self.channel = channel
+        self.topic = topic
+        self.message = message
+        self.queued_at = time.perf_counter()
+
+
+class Sink:
+    """Delivers batches of notifications for one channel."""
+
+    async def deliver(self, batch: List[Notification]) -> None:
+        """Deliver every notification in `batch`, or raise to have the batch retried."""
+        raise NotImplementedError
+
+
+class MemorySink(Sink):
+    """Stand-in provider keeping the last `keep` notifications delivered.
+
+    Each batch takes `latency` seconds, like one call to a provider's batch
+    API, and fails with probability `failure_rate`.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, keep: int = 1000):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.delivered: "deque[Notification]" = deque(maxlen=keep)
+
+    async def deliver(self, batch: List[Notification]) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError(f"Simulated failure delivering {len(batch)} notifications")
+        self.delivered.extend(batch)
+
+
+class LogSink(MemorySink):
+    """MemorySink that also logs every notification it delivers."""
+
+    async def deliver(self, batch: List[Notification]) -> None:
+        await super().deliver(batch)
+        for notification in batch:
+            logger.info(
+                "%s to user %d about %s: %s",
+                notification.channel, notification.user_id, notification.topic, notification.message,
+            )
+
+
+class ChannelStats:
+    """Counters and a batch latency histogram for one channel."""
+
+    __slots__ = ("queued", "dropped", "delivered", "failed", "retries", "batches", "latency_buckets", "latency_total")
+
+    def __init__(self):
+        self.queued = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+
+    def observe_batch(self, size: int, seconds: float) -> None:
+        self.delivered += size
+        self.batches += 1
+        self.latency_buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_total += seconds
+
+
+class Dispatcher:
+    """Bounded queues of notifications, one per channel, drained in batches.
+
+    Batch latency is the time from the first notification of a batch being
+    queued to the whole batch being delivered, retries included. Call
+    `submit` and `put` from the event loop only.
+    """
+
+    def __init__(
+        self,
+        sinks: Dict[str, Sink],
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        batch_wait: float = 0.05,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ):
+        self.sinks = sinks
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queues: Dict[str, asyncio.Queue] = {channel: asyncio.Queue(max_queue) for channel in sinks}
+        self.stats: Dict[str, ChannelStats] = {channel: ChannelStats() for channel in sinks}
+        self._tasks: List[asyncio.Task] = []
+
+    def depth(self) -> int:
+        """Notifications queued across all channels."""
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    def submit(self, notification: Notification) -> bool:
+        """Queue `notification` without waiting; False, dropping it, if its queue is full."""
+        stats = self.stats[notification.channel]
+        try:
+            self.queues[notification.channel].put_nowait(notification)
+        except asyncio.QueueFull:
+            stats.dropped += 1
+            return False
+        stats.queued += 1
+        return True
+
+    async def put(self, notification: Notification) -> None:
+        """Queue `notification`, waiting for room in its channel's queue."""
+        await self.queues[notification.channel].put(notification)
+        self.stats[notification.channel].queued += 1
+
+    def start(self) -> None:
+        """Start one delivery task per channel on the running event loop."""
+        # A queue belongs to the first loop that waits on it, so every start
+        # (in a forked worker, or under a new test client) gets fresh queues
+        # holding whatever was queued before.
+        for channel, old in self.queues.items():
+            queue = self.queues[channel] = asyncio.Queue(self.max_queue)
+            while not old.empty():
+                queue.put_nowait(old.get_nowait())
+        self._tasks = [asyncio.create_task(self._run(channel)) for channel in self.sinks]
+
+    async def stop(self, timeout: float) -> None:
+        """Give queued notifications up to `timeout` seconds to be delivered, then stop."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues.values())), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %d notifications undelivered", self.depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, channel: str) -> None:
+        queue = self.queues[channel]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._deliver(channel, batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _deliver(self, channel: str, batch: List[Notification]) -> None:
+        stats = self.stats[channel]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sinks[channel].deliver(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    stats.failed += len(batch)
+                    logger.warning("Gave up on %d %s notifications after %d attempts: %s", len(batch), channel, attempt + 1, e)
+                    return
+                stats.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            else:
+                stats.observe_batch(len(batch), time.perf_counter() - batch[0].queued_at)
+                return
+
+
+def _sink() -> Sink:
+    """Build the stand-in sink selected by config.NOTIFICATION_SINK."""
+    if config.NOTIFICATION_SINK == "memory":
+        return MemorySink(config.NOTIFICATION_SINK_LATENCY, config.NOTIFICATION_SINK_FAILURE_RATE)
+    if config.NOTIFICATION_SINK == "log":
+        return LogSink(config.NOTIFICATION_SINK_LATENCY, config.NOTIFICATION_SINK_FAILURE_RATE)
+    raise ValueError(f"Unknown NOTIFICATION_SINK {config.NOTIFICATION_SINK!r}")
+
+
+dispatcher = Dispatcher(
+    {channel.value: _sink() for channel in NotificationType if channel is not NotificationType.NONE},
+    config.NOTIFICATION_QUEUE_SIZE,
+    config.NOTIFICATION_BATCH_SIZE,
+    config.NOTIFICATION_BATCH_WAIT,
+    config.NOTIFICATION_MAX_RETRIES,
+    config.NOTIFICATION_RETRY_BACKOFF,
+)
+
+
+def notify(user_id: int, topic: str, message: Dict[str, Any]) -> bool:
+    """Queue a notification about `topic` on the channel the user chose for it.
+
+    Users who saved no preferences get the defaults of
+    NotificationPreferences. Returns False if the user turned the topic off
+    or the channel's queue is full.
+    """
+    channel = (get_notification_preferences(user_id) or DEFAULT_PREFERENCES)[topic]
+    if channel == NotificationType.NONE.value:
+        return False
+    return dispatcher.submit(Notification(user_id, channel, topic, message))
+
+
+async def broadcast(topic: str, message: Dict[str, Any]) -> int:
+    """Queue `message` about `topic` for every user subscribed to it; return how many.
+
+    Subscribers are read channel by channel from the preferences index.
+    Full queues are waited on rather than dropped from, so a broadcast
+    larger than NOTIFICATION_QUEUE_SIZE finishes as delivery catches up.
+    """
+    queued = 0
+    for channel in dispatcher.sinks:
+        for user_id in get_subscriber_ids(topic, channel, DEFAULT_PREFERENCES[topic]):
+            await dispatcher.put(Notification(user_id, channel, topic, message))
+            queued += 1
+    return queued
@@ -1,15 +1,213 @@
 """Main FastAPI application entry point."""
 
+import asyncio
+import json
+import math
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List, Optional, Pattern, Set, Tuple
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Match
 from datetime import datetime
 
-from app.routers import users, products, orders, auth, addresses, reviews, cart, notifications
+from app import config
+from app.cache import CacheMiddleware, response_cache
+from app.database import products_db, reviews_db, storage, sync_tables, tables
+from app.delivery import dispatcher
+from app.metrics import Metrics, render
+from app.profiler import profiler
+from app.ratelimit import LoadShedder, TokenBuckets
+from app.security import InvalidToken, tokens
+from app.serialization import FastJSONResponse
+from app.routers import users, products, orders, auth, addresses, reviews, cart, notifications, admin
+
+
+class StorageSyncMiddleware:
+    """Apply writes committed by other workers before handling each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            sync_tables()
+        await self.app(scope, receive, send)
+
+
+class _StatusRecorder:
+    """ASGI send wrapper that remembers the response status; 500 until one is sent."""
+
+    __slots__ = ("send", "status")
+
+    def __init__(self, send):
+        self.send = send
+        self.status = 500
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        await self.send(message)
+
+
+class MetricsMiddleware:
+    """Record request count, status code and latency per templated route."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        recorder = _StatusRecorder(send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, recorder)
+        finally:
+            self.metrics.observe(scope["method"], _route_template(scope), recorder.status, time.perf_counter() - start)
+
+
+async def _reject(send, status: int, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class LoadShedMiddleware:
+    """Answer 503 with Retry-After at once while the worker is overloaded.
+
+    Paths in `exempt` are always let through, so health checks and metrics
+    scrapes keep working while the worker sheds load.
+    """
+
+    def __init__(self, app, shedder: LoadShedder, exempt: Set[str] = frozenset()):
+        self.app = app
+        self.shedder = shedder
+        self.exempt = exempt
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            return await self.app(scope, receive, send)
+        shedder = self.shedder
+        if shedder.overloaded():
+            shedder.shed += 1
+            # Recorded under "shed" rather than looked up by _route_template.
+            scope["route_template"] = "shed"
+            return await _reject(send, 503, 1, "Server is overloaded")
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shedder.in_flight -= 1
+
+
+RateLimit = Tuple[Optional[Set[str]], Optional[Pattern], TokenBuckets]
+
+
+class RateLimitMiddleware:
+    """Answer 429 with Retry-After to clients over a request rate.
+
+    Each limit is (methods, path pattern, buckets), None matching any; a
+    request takes a token from every limit it matches.
+    """
+
+    def __init__(self, app, limits: Dict[str, RateLimit]):
+        self.app = app
+        self.limits = list(limits.values())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.limits:
+            client = _client(scope)
+            now = time.monotonic()
+            for methods, path, buckets in self.limits:
+                if (methods is None or scope["method"] in methods) and (path is None or path.fullmatch(scope["path"])):
+                    wait = buckets.acquire(client, now)
+                    if wait:
+                        return await _reject(send, 429, wait, "Too many requests")
+        await self.app(scope, receive, send)
+
+
+def _client(scope) -> Hashable:
+    """Who a request is rate limited as: the user of a valid bearer token, else the peer address."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                try:
+                    return tokens.verify(token)
+                except InvalidToken:
+                    pass
+            break
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def _rate_limits() -> Dict[str, RateLimit]:
+    def buckets(rate: float) -> TokenBuckets:
+        return TokenBuckets(rate, max(1.0, 2 * rate), config.RATE_LIMIT_MAX_CLIENTS)
+
+    limits: Dict[str, RateLimit] = {}
+    if config.LOGIN_RATE_LIMIT:
+        limits["login"] = ({"POST"}, re.compile(r"/auth/(login|register)"), buckets(config.LOGIN_RATE_LIMIT))
+    if config.ORDER_RATE_LIMIT:
+        limits["orders"] = ({"POST"}, re.compile(r"/orders|/cart/\d+/checkout"), buckets(config.ORDER_RATE_LIMIT))
+    if config.RATE_LIMIT:
+        limits["all"] = (None, None, buckets(config.RATE_LIMIT))
+    return limits
+
+
+def _route_template(scope) -> str:
+    """Path template of the route that handled a request, e.g. /users/{user_id}.
+
+    Middleware answering before the router (the response cache, load
+    shedding) records the template in scope["route_template"].
+    """
+    template = scope.get("route_template")
+    if template is not None:
+        return template
+    route = scope.get("route")
+    if route is None:
+        # Only requests rejected before routing, such as rate-limited ones.
+        route = next((r for r in app.router.routes if r.matches(scope)[0] == Match.FULL), None)
+    return route.path if route is not None else "unmatched"
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run background maintenance and notification delivery for as long as the app is serving."""
+    tasks = [asyncio.create_task(cart.sweep_expired_carts())]
+    if shedder.max_lag:
+        tasks.append(asyncio.create_task(shedder.monitor()))
+    dispatcher.start()
+    yield
+    for task in tasks:
+        task.cancel()
+    await dispatcher.stop(config.NOTIFICATION_DRAIN_TIMEOUT)
+
+
+metrics = Metrics()
+rate_limits = _rate_limits()
+shedder = LoadShedder(config.MAX_IN_FLIGHT, config.MAX_LOOP_LAG)
+profiler.track_requests(MetricsMiddleware.__call__, lambda scope: f"{scope['method']} {_route_template(scope)}")
 
 # Create FastAPI app with metadata
 app = FastAPI(
     title="PreMan Demo API",
     description="A demo backend designed to showcase PreMan's capabilities",
     version="1.0.0",
+    default_response_class=FastJSONResponse if config.FAST_JSON else JSONResponse,
+    lifespan=lifespan,
 )
 
 # Include routers - PreMan will discover all endpoints from these
@@ -21,6 +219,97 @@ app.include_router(addresses.router)
 app.include_router(reviews.router)
 app.include_router(cart.router)
 app.include_router(notifications.router)
+app.include_router(admin.router)
+
+# Product reads are served from the response cache; every write to the
+# products table, local or synced from another worker, invalidates the list
+# pages and the detail page of the rows it touched.
+app.add_middleware(
+    CacheMiddleware,
+    cache=response_cache,
+    routes=[
+        (r"/products", "/products", lambda match: ["products"]),
+        (r"/products/(\d+)", "/products/{product_id}", lambda match: [f"product:{int(match[1])}"]),
+    ],
+)
+products_db.on_change(
+    lambda ids: response_cache.invalidate("products", *(f"product:{row_id}" for row_id in ids))
+)
+# Product detail pages embed the review summary.
+reviews_db.on_change(
+    lambda ids: response_cache.invalidate(
+        *(f"product:{reviews_db.rows[row_id]['product_id']}" for row_id in ids if row_id in reviews_db.rows)
+    )
+)
+
+# Added after the cache so it runs first: synced writes invalidate the
+# cache before it is read.
+if storage.shared:
+    app.add_middleware(StorageSyncMiddleware)
+
+# Turn requests away before they cost a storage sync, a cache lookup or a
+# handler; rejections still show up in the request metrics, shed ones under
+# the route "shed".
+app.add_middleware(RateLimitMiddleware, limits=rate_limits)
+app.add_middleware(LoadShedMiddleware, shedder=shedder, exempt={"/health", "/metrics"})
+
+# Outermost, so latency covers everything above.
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+
+# Requests run by warm_up: plain reads, the docs and a rejected body, none
+# of which writes or fills the response cache.
+WARM_UP_REQUESTS = [
+    ("GET", "/health", b""),
+    ("GET", "/", b""),
+    ("GET", "/openapi.json", b""),
+    ("GET", "/docs", b""),
+    ("GET", "/users?limit=1", b""),
+    ("GET", "/metrics", b""),
+    ("POST", "/users", b"{}"),
+]
+
+
+async def warm_up() -> List[Tuple[str, str, int]]:
+    """Send WARM_UP_REQUESTS through the app, then reset per-process counters.
+
+    Builds the middleware stack and the OpenAPI document and runs each
+    layer once, so the first real request pays none of it. Returns the
+    method, path and status of each request.
+    """
+    results = []
+    for method, target, body in WARM_UP_REQUESTS:
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"warm-up"), (b"content-type", b"application/json")],
+            "client": None,
+            "server": None,
+        }
+        status = 0
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await app(scope, receive, send)
+        results.append((method, target, status))
+    metrics.routes.clear()
+    for _, _, buckets in rate_limits.values():
+        buckets.full_at.clear()
+    return results
 
 
 @app.get("/health", tags=["health"], summary="Health check endpoint")
@@ -33,6 +322,21 @@ async def health_check():
     }
 
 
+@app.get("/cache/stats", tags=["health"], summary="Response cache counters")
+async def cache_stats():
+    """Hit, miss, eviction and invalidation counts of the response cache."""
+    return response_cache.stats()
+
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse, summary="Prometheus metrics")
+async def prometheus_metrics():
+    """Per-route request metrics, table and index sizes, cache, rate limit, load shedding and notification counters."""
+    limits = {name: buckets for name, (_, _, buckets) in rate_limits.items()}
+    return PlainTextResponse(
+        render(metrics, tables, response_cache, tokens, limits, shedder, dispatcher), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/", tags=["info"], summary="API information")
 async def root():
     """Root endpoint with API information."""
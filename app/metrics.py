@@ -0,0 +1,181 @@
+"""Request metrics and their Prometheus text exposition.
+
+Each route gets its counters the first time it is hit: a latency histogram
+with fixed bucket bounds and a count per status code. Recording a request
+only increments integers in place, so the hot path does not allocate.
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from app.cache import ResponseCache
+from app.database import Table
+from app.delivery import LATENCY_BUCKETS, Dispatcher
+from app.ratelimit import LoadShedder, TokenBuckets
+from app.security import TokenSigner
+
+# Upper bounds of the latency buckets, in seconds; the last bucket is +Inf.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteMetrics:
+    """Latency histogram and status code counts for one method and route."""
+
+    __slots__ = ("buckets", "total", "count", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+
+    def observe(self, status: int, seconds: float) -> None:
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class Metrics:
+    """Per-route request metrics, keyed by method and templated path."""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        series = self.routes.get((method, route))
+        if series is None:
+            series = self.routes[(method, route)] = RouteMetrics()
+        series.observe(status, seconds)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(
+    metrics: Metrics,
+    tables: Dict[str, Table],
+    cache: ResponseCache,
+    tokens: TokenSigner,
+    rate_limits: Dict[str, TokenBuckets],
+    shedder: LoadShedder,
+    dispatcher: Dispatcher,
+) -> str:
+    """Format request, table, index, cache, token, rate limit, load and notification metrics in Prometheus text format."""
+    lines: List[str] = [
+        "# HELP preman_http_requests_total Requests handled, by route and status code.",
+        "# TYPE preman_http_requests_total counter",
+    ]
+    routes = sorted(metrics.routes.items())
+    for (method, route), series in routes:
+        for status, count in sorted(series.statuses.items()):
+            lines.append(
+                f'preman_http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+            )
+
+    lines += [
+        "# HELP preman_http_request_duration_seconds Request latency, by route.",
+        "# TYPE preman_http_request_duration_seconds histogram",
+    ]
+    for (method, route), series in routes:
+        labels = f'method="{method}",route="{_label(route)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), series.buckets):
+            cumulative += count
+            lines.append(f'preman_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"preman_http_request_duration_seconds_sum{{{labels}}} {series.total}")
+        lines.append(f"preman_http_request_duration_seconds_count{{{labels}}} {series.count}")
+
+    lines += [
+        "# HELP preman_table_rows Rows held in memory, by table.",
+        "# TYPE preman_table_rows gauge",
+    ]
+    lines += [f'preman_table_rows{{table="{name}"}} {len(table)}' for name, table in tables.items()]
+    lines += [
+        "# HELP preman_index_entries Distinct keys held by each secondary index.",
+        "# TYPE preman_index_entries gauge",
+    ]
+    for name, table in tables.items():
+        for field, index in table.indexes.items():
+            lines.append(f'preman_index_entries{{table="{name}",field="{field}",kind="{index.kind}"}} {len(index)}')
+
+    stats = cache.stats()
+    lines += [
+        "# HELP preman_cache_entries Responses held in the response cache.",
+        "# TYPE preman_cache_entries gauge",
+        f"preman_cache_entries {stats['entries']}",
+    ]
+    for name in ("hits", "misses", "evictions", "invalidations"):
+        lines += [
+            f"# HELP preman_cache_{name}_total Response cache {name}.",
+            f"# TYPE preman_cache_{name}_total counter",
+            f"preman_cache_{name}_total {stats[name]}",
+        ]
+
+    stats = tokens.stats()
+    lines += [
+        "# HELP preman_token_cache_entries Verified access tokens held in the token cache.",
+        "# TYPE preman_token_cache_entries gauge",
+        f"preman_token_cache_entries {stats['entries']}",
+    ]
+    for name in ("hits", "misses"):
+        lines += [
+            f"# HELP preman_token_cache_{name}_total Token cache {name}.",
+            f"# TYPE preman_token_cache_{name}_total counter",
+            f"preman_token_cache_{name}_total {stats[name]}",
+        ]
+
+    lines += [
+        "# HELP preman_rate_limited_total Requests rejected with 429, by limit.",
+        "# TYPE preman_rate_limited_total counter",
+    ]
+    lines += [f'preman_rate_limited_total{{limit="{name}"}} {buckets.rejected}' for name, buckets in rate_limits.items()]
+    lines += [
+        "# HELP preman_rate_limit_clients Clients with a bucket that is not yet full, by limit.",
+        "# TYPE preman_rate_limit_clients gauge",
+    ]
+    lines += [f'preman_rate_limit_clients{{limit="{name}"}} {len(buckets)}' for name, buckets in rate_limits.items()]
+    lines += [
+        "# HELP preman_shed_total Requests rejected with 503 while overloaded.",
+        "# TYPE preman_shed_total counter",
+        f"preman_shed_total {shedder.shed}",
+        "# HELP preman_requests_in_flight Requests being handled.",
+        "# TYPE preman_requests_in_flight gauge",
+        f"preman_requests_in_flight {shedder.in_flight}",
+        "# HELP preman_event_loop_lag_seconds How late the event loop last ran a timer.",
+        "# TYPE preman_event_loop_lag_seconds gauge",
+        f"preman_event_loop_lag_seconds {shedder.lag}",
+    ]
+
+    channels = sorted(dispatcher.stats.items())
+    lines += [
+        "# HELP preman_notification_queue_depth Notifications waiting to be delivered, by channel.",
+        "# TYPE preman_notification_queue_depth gauge",
+    ]
+    lines += [f'preman_notification_queue_depth{{channel="{channel}"}} {dispatcher.queues[channel].qsize()}' for channel, _ in channels]
+    for name, help_text in (
+        ("queued", "Notifications accepted into a queue"),
+        ("dropped", "Notifications dropped because their queue was full"),
+        ("delivered", "Notifications delivered"),
+        ("failed", "Notifications given up on after every retry failed"),
+        ("retries", "Batch deliveries retried"),
+    ):
+        lines += [
+            f"# HELP preman_notification_{name}_total {help_text}, by channel.",
+            f"# TYPE preman_notification_{name}_total counter",
+        ]
+        lines += [f'preman_notification_{name}_total{{channel="{channel}"}} {getattr(stats, name)}' for channel, stats in channels]
+    lines += [
+        "# HELP preman_notification_batch_latency_seconds Time from a batch's first notification being queued to the batch being delivered, by channel.",
+        "# TYPE preman_notification_batch_latency_seconds histogram",
+    ]
+    for channel, stats in channels:
+        labels = f'channel="{channel}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.latency_buckets):
+            cumulative += count
+            lines.append(f'preman_notification_batch_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"preman_notification_batch_latency_seconds_sum{{{labels}}} {stats.latency_total}")
+        lines.append(f"preman_notification_batch_latency_seconds_count{{{labels}}} {stats.batches}")
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,7 @@
 """Pydantic models for request/response validation."""
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -36,6 +36,7 @@ class Product(BaseModel):
     price: float = Field(..., gt=0, description="Product price in USD")
     description: Optional[str] = Field(None, description="Product description")
     in_stock: bool = Field(True, description="Whether product is in stock")
+    stock: Optional[int] = Field(None, ge=0, description="Units available; not tracked if null")
 
 
 class ProductCreate(BaseModel):
@@ -44,6 +45,7 @@ class ProductCreate(BaseModel):
     price: float = Field(..., gt=0)
     description: Optional[str] = None
     in_stock: bool = True
+    stock: Optional[int] = Field(None, ge=0, description="Units available; sets in_stock when given")
 
 
 class Address(BaseModel):
@@ -88,6 +90,21 @@ class Review(BaseModel):
     created_at: datetime
 
 
+class ReviewSummary(BaseModel):
+    """Aggregated reviews of one product."""
+    product_id: int
+    review_count: int
+    rating_sum: int
+    average_rating: Optional[float] = None
+    rating_histogram: Dict[str, int] = Field(..., description="Number of reviews per rating, keyed \"1\" to \"5\"")
+    verified_count: int
+
+
+class ProductDetail(Product):
+    """Product with its review summary."""
+    review_summary: ReviewSummary
+
+
 class CartItem(BaseModel):
     """Cart item model."""
     product_id: int = Field(..., gt=0)
@@ -96,7 +113,29 @@ class CartItem(BaseModel):
 
 class CartCreate(BaseModel):
     """Model for creating a shopping cart."""
-    items: List[CartItem] = Field(..., min_items=1, max_items=50)
+    items: List[CartItem] = Field(..., min_length=1, max_length=50)
+    coupon_code: Optional[str] = Field(None, max_length=20)
+
+
+class CartOperationType(str, Enum):
+    """Line-level cart operation."""
+    ADD = "add"
+    SET = "set"
+    REMOVE = "remove"
+
+
+class CartOperation(BaseModel):
+    """One change to a cart line, identified by product."""
+    op: CartOperationType
+    product_id: int = Field(..., gt=0)
+    quantity: Optional[int] = Field(
+        None, ge=0, le=100, description="Quantity to add (add) or the new quantity (set); ignored by remove"
+    )
+
+
+class CartUpdate(BaseModel):
+    """Model for changing a cart's lines and coupon."""
+    operations: List[CartOperation] = Field(default_factory=list, max_length=50)
     coupon_code: Optional[str] = Field(None, max_length=20)
 
 
@@ -108,6 +147,15 @@ class Cart(BaseModel):
     total: float
     coupon_code: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class CheckoutRequest(BaseModel):
+    """Model for checking out a cart."""
+    user_id: Optional[int] = Field(None, gt=0, description="User placing the order; must be the cart's owner if it has one")
+    shipping_address: Optional[AddressCreate] = None
+    notes: Optional[str] = Field(None, max_length=1000)
+    payment_method: Optional[str] = Field(None, max_length=50)
 
 
 class LoginRequest(BaseModel):
@@ -151,7 +199,7 @@ class OrderItem(BaseModel):
 class OrderCreate(BaseModel):
     """Model for creating an order (with nested OrderItem list)."""
     user_id: int = Field(..., gt=0, description="User ID placing the order")
-    items: List[OrderItem] = Field(..., min_items=1, max_items=50, description="List of order items")
+    items: List[OrderItem] = Field(..., min_length=1, max_length=50, description="List of order items")
     shipping_address: Optional[AddressCreate] = Field(None, description="Shipping address (nested model)")
     notes: Optional[str] = Field(None, max_length=1000, description="Order notes")
     payment_method: Optional[str] = Field(None, max_length=50, description="Payment method")
@@ -0,0 +1,20 @@
+"""Money arithmetic in integer cents."""
+
+from operator import mul
+from typing import List, Tuple
+
+
+def to_cents(amount: float) -> int:
+    """Convert a dollar amount to whole cents."""
+    return round(amount * 100)
+
+
+def from_cents(cents: int) -> float:
+    """Convert whole cents back to a dollar amount."""
+    return cents / 100
+
+
+def line_totals(prices: List[float], quantities: List[int]) -> Tuple[List[int], int]:
+    """Price a batch of lines at once; return per-line subtotals and the total, in cents."""
+    subtotals = list(map(mul, map(to_cents, prices), quantities))
+    return subtotals, sum(subtotals)
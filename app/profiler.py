@@ -0,0 +1,92 @@
+"""Sampling profiler that attributes stacks to the request being handled.
+
+A background thread snapshots every thread's stack with
+`sys._current_frames()` at a fixed interval. A stack passing through the
+request entry point registered with `track_requests` is charged to that
+request's route, and the counts are returned in the collapsed-stack format
+read by flamegraph.pl and speedscope, with the route as the root frame.
+Nothing is traced between samples, so the cost to request handling is one
+stack walk per thread per interval.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Callable, Dict, List, Optional, Tuple
+
+NO_ROUTE = "(no route)"
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_name(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+class SamplingProfiler:
+    """Samples stacks for a fixed time; one profile runs at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entry: Optional[CodeType] = None
+        self.label: Optional[Callable[[Dict], str]] = None
+
+    def track_requests(self, entry: Callable, label: Callable[[Dict], str]) -> None:
+        """Charge stacks through `entry`, an ASGI callable, to `label(scope)`."""
+        self.entry = entry.__code__
+        self.label = label
+
+    def _walk(self, frame: FrameType) -> Tuple[Optional[str], Tuple[str, ...]]:
+        stack: List[str] = []
+        route = None
+        while frame is not None:
+            if frame.f_code is self.entry:
+                scope = frame.f_locals.get("scope")
+                if scope is not None:
+                    route = self.label(scope)
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        stack.reverse()
+        return route, tuple(stack)
+
+    def profile(self, seconds: float, interval: float, all_stacks: bool = False) -> Counter:
+        """Sample for `seconds` and return sample counts per (route, *frames).
+
+        Stacks outside a request are dropped unless `all_stacks`, in
+        which case they are charged to NO_ROUTE. Blocks the calling thread;
+        raises ProfilerBusy if a profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            own = threading.get_ident()
+            counts: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own:
+                        continue
+                    route, stack = self._walk(frame)
+                    if route is not None:
+                        counts[(route,) + stack] += 1
+                    elif all_stacks:
+                        counts[(NO_ROUTE,) + stack] += 1
+                time.sleep(interval)
+            return counts
+        finally:
+            self._lock.release()
+
+
+def collapse(counts: Counter) -> str:
+    """Format stack counts as collapsed stacks, one "frame;frame;... count" per line."""
+    return "".join(
+        f"{';'.join(stack)} {count}\n"
+        for stack, count in counts.most_common()
+    )
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,220 @@
+"""Filter-then-paginate queries over the in-memory tables.
+
+Results can be paged with skip/limit or with an opaque keyset cursor. A
+cursor encodes the sort key of the last row returned, so fetching the next
+page costs the same at any depth and is not shifted by concurrent writes.
+"""
+
+import base64
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.database import users_db, products_db, reviews_db, orders_db
+from app.search import TrigramIndex
+
+Page = Tuple[List[Dict], Optional[str]]
+
+
+def encode_cursor(key: List[Any]) -> str:
+    """Encode a sort key as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor into a sort key of `size` parts; raise ValueError if invalid."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != size or not all(
+        isinstance(part, (int, float)) and not isinstance(part, bool) for part in key
+    ):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _paginate(table, ids: Iterator[int], skip: int, limit: int, sort_key) -> Page:
+    """Resolve one page of matching ids to rows, plus the cursor for the next page."""
+    rows = [table.rows[row_id] for row_id in islice(ids, skip, skip + limit + 1)]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort_key(rows[-1]))
+
+
+def _matching_ids(
+    table,
+    indexes: List[TrigramIndex],
+    search: str,
+    prefix: bool,
+    after: Optional[float],
+    wanted: int,
+    keep: Optional[Callable[[int], bool]],
+) -> Iterator[int]:
+    """Yield ids past `after` of rows matching `search` in any of `indexes`, in id order.
+
+    The ids come either from sorting the candidate sets, which costs their
+    size, or from walking the table's id order from `after` and testing each
+    row, which costs about `wanted` rows divided by the share of rows that
+    are candidates. The cheaper estimate is used, so a page costs at most
+    about sqrt(wanted * rows) whether the search is narrow or broad. Queries
+    too short for a trigram always walk.
+    """
+    def match(row_id: int) -> bool:
+        return any(index.matches(search, row_id, prefix) for index in indexes) and (keep is None or keep(row_id))
+
+    sets = [index.candidates(search, prefix) for index in indexes]
+    if any(candidates is None for candidates in sets):
+        return (row_id for row_id in table.ids_after(after) if match(row_id))
+    total = sum(len(candidates) for candidates in sets)
+    if total * total <= wanted * len(table):
+        start = 0 if after is None else after
+        ids = sorted({row_id for candidates in sets for row_id in candidates if row_id > start})
+        return (row_id for row_id in ids if match(row_id))
+    return (
+        row_id for row_id in table.ids_after(after)
+        if any(row_id in candidates for candidates in sets) and match(row_id)
+    )
+
+
+def _search(
+    table,
+    fields: List[str],
+    search: str,
+    prefix: bool,
+    rank: bool,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    keep: Optional[Callable[[int], bool]] = None,
+) -> Page:
+    """Page through rows matching `search` in any of the text-indexed `fields`.
+
+    Matches are ordered by id, or by relevance tier then id if `rank`. Each
+    page seeks from its cursor and stops once full, so it never collects or
+    sorts every match; a ranked page walks the tiers from the cursor's one on.
+    """
+    indexes = [table.indexes[field] for field in fields]
+    wanted = skip + limit + 1
+
+    def tier(row_id: int) -> int:
+        return min(index.score(search, row_id, prefix) for index in indexes)
+
+    if not rank:
+        after = decode_cursor(cursor, 1)[0] if cursor else None
+        ids = _matching_ids(table, indexes, search, prefix, after, wanted, keep)
+        return _paginate(table, ids, skip, limit, lambda row: [row[table.primary_key]])
+
+    first_tier, after = decode_cursor(cursor, 2) if cursor else (0, None)
+
+    def ranked() -> Iterator[int]:
+        for level in range(max(int(first_tier), 0), 4):
+            start = after if level == first_tier else None
+            for row_id in _matching_ids(table, indexes, search, prefix, start, wanted, keep):
+                if tier(row_id) == level:
+                    yield row_id
+
+    return _paginate(table, ranked(), skip, limit, lambda row: [tier(row[table.primary_key]), row[table.primary_key]])
+
+
+def query_users(
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    prefix: bool = False,
+    rank: bool = False,
+) -> Page:
+    """Page through users in id order, optionally searching by name."""
+    if search:
+        return _search(users_db, ["name"], search, prefix, rank, skip, limit, cursor)
+    after = decode_cursor(cursor, 1)[0] if cursor else None
+    ids = users_db.ids_after(after)
+    return _paginate(users_db, ids, skip, limit, lambda u: [u["id"]])
+
+
+def query_products(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    prefix: bool = False,
+    rank: bool = False,
+) -> Page:
+    """Filter products, then paginate the matches.
+
+    A text search over name and description drives the query when given,
+    with the other filters checked per match. Otherwise, with a price bound
+    the matches come from a bisect range scan of the price index, ordered by
+    price then id, costing O(log n + skip + limit); without one they come in
+    id order, from the in_stock bitmap if given.
+    """
+    stock = products_db.indexes["in_stock"]
+    if search:
+        def keep(row_id: int) -> bool:
+            price = products_db.rows[row_id]["price"]
+            return (
+                (min_price is None or price >= min_price)
+                and (max_price is None or price <= max_price)
+                and (in_stock is None or stock.contains(in_stock, row_id))
+            )
+        return _search(products_db, ["name", "description"], search, prefix, rank, skip, limit, cursor, keep)
+
+    if min_price is not None or max_price is not None:
+        after = decode_cursor(cursor, 2) if cursor else None
+        ids = products_db.indexes["price"].range(min_price, max_price, after)
+        if in_stock is not None:
+            ids = (row_id for row_id in ids if stock.contains(in_stock, row_id))
+        return _paginate(products_db, ids, skip, limit, lambda p: [p["price"], p["id"]])
+
+    after = decode_cursor(cursor, 1)[0] if cursor else None
+    if in_stock is not None:
+        ids = stock.ids(in_stock, 0 if after is None else after + 1)
+    else:
+        ids = products_db.ids_after(after)
+    return _paginate(products_db, ids, skip, limit, lambda p: [p["id"]])
+
+
+def query_reviews(product_id: int, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> Page:
+    """Page through a product's reviews in id order.
+
+    The matches come from a range scan of the (product_id, id) index, so a
+    page costs O(log n + skip + limit) however many reviews there are.
+    """
+    after = (product_id, decode_cursor(cursor, 1)[0]) if cursor else None
+    ids = reviews_db.indexes["product_id"].range(product_id, product_id, after)
+    return _paginate(reviews_db, ids, skip, limit, lambda r: [r["id"]])
+
+
+def query_user_orders(user_id: int, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> Page:
+    """Page through a user's orders in id order, from a range scan of the (user_id, id) index."""
+    after = (user_id, decode_cursor(cursor, 1)[0]) if cursor else None
+    ids = orders_db.indexes["user_id"].range(user_id, user_id, after)
+    return _paginate(orders_db, ids, skip, limit, lambda o: [o["order_id"]])
+
+
+def query_orders(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+) -> Page:
+    """Page through orders created between `since` and `until`, oldest first.
+
+    Both bounds are ISO timestamps, matched against the created_at index.
+    The cursor holds the last order id; its creation time is looked up to
+    resume the range scan.
+    """
+    after = None
+    if cursor:
+        last = orders_db.get(decode_cursor(cursor, 1)[0])
+        if last is None:
+            raise ValueError("Invalid cursor")
+        after = (last["created_at"], last["order_id"])
+    ids = orders_db.indexes["created_at"].range(since, until, after)
+    return _paginate(orders_db, ids, skip, limit, lambda o: [o["order_id"]])
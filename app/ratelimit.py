@@ -0,0 +1,82 @@
+"""Per-client rate limits and load shedding state.
+
+TokenBuckets holds a token bucket for every client in a single float: the
+time at which the bucket will be full again (the generic cell rate
+algorithm). A bucket that has refilled is the same as no bucket at all,
+so entries are dropped lazily once full, and memory follows the number of
+clients active within the last burst rather than every client ever seen.
+
+LoadShedder counts requests in flight and measures how late the event loop
+runs a timer, the delay every queued callback is currently waiting.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBuckets:
+    """Token buckets refilling at `rate` a second up to `burst`, one per client.
+
+    Entries are kept in order of last use. Each grant drops up to two
+    refilled entries from the front, and past `max_clients` entries the
+    least recently used one is dropped, at worst forgiving that client's
+    debt. Not thread safe; call from the event loop.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.interval = 1.0 / rate
+        self.tolerance = burst * self.interval
+        self.max_clients = max_clients
+        self.full_at: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self.full_at)
+
+    def acquire(self, client: Hashable, now: float) -> float:
+        """Take a token for `client`; return 0 if granted, else seconds until one is."""
+        full_at = self.full_at
+        start = full_at.get(client, now)
+        if start < now:
+            start = now
+        end = start + self.interval
+        if end - now > self.tolerance:
+            full_at.move_to_end(client)
+            self.rejected += 1
+            return end - now - self.tolerance
+        full_at[client] = end
+        full_at.move_to_end(client)
+        for _ in range(2):
+            oldest = next(iter(full_at))
+            if full_at[oldest] > now:
+                break
+            del full_at[oldest]
+        if len(full_at) > self.max_clients:
+            full_at.popitem(last=False)
+        return 0.0
+
+
+class LoadShedder:
+    """Tells when to turn requests away: too many in flight or a lagging event loop."""
+
+    def __init__(self, max_in_flight: int, max_lag: float):
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag
+        self.in_flight = 0
+        self.lag = 0.0
+        self.shed = 0
+
+    def overloaded(self) -> bool:
+        return bool(
+            (self.max_in_flight and self.in_flight >= self.max_in_flight)
+            or (self.max_lag and self.lag > self.max_lag)
+        )
+
+    async def monitor(self, interval: float = 0.05) -> None:
+        """Measure event loop lag every `interval` seconds, forever."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag = max(0.0, time.perf_counter() - start - interval)
@@ -1,11 +1,13 @@
 """Address endpoints."""
 
 from fastapi import APIRouter, HTTPException, Path
+from typing import List
 
 from app.models import Address, AddressCreate
-from app.database import users_db, addresses_db, next_address_id
+from app.database import addresses_db, get_user_by_id, get_addresses_for_user
+from app.validation import JSONBodyRoute
 
-router = APIRouter(tags=["addresses"])
+router = APIRouter(tags=["addresses"], route_class=JSONBodyRoute)
 
 
 @router.post("/users/{user_id}/addresses", response_model=Address, status_code=201, summary="Add address for user")
@@ -14,16 +16,24 @@ async def create_user_address(
     address: AddressCreate = ...
 ):
     """Add an address for a user (nested model endpoint)."""
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    user = get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     
-    global next_address_id
     new_address = {
-        "id": next_address_id,
+        "id": addresses_db.next_id(),
         "user_id": user_id,
         **address.model_dump()
     }
-    addresses_db.append(new_address)
-    next_address_id += 1
+    addresses_db.insert(new_address)
     return new_address
+
+
+@router.get("/users/{user_id}/addresses", response_model=List[Address], summary="List addresses for user")
+async def list_user_addresses(
+    user_id: int = Path(..., gt=0)
+):
+    """List all addresses belonging to a user."""
+    if not get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    return get_addresses_for_user(user_id)
@@ -0,0 +1,59 @@
+"""Admin endpoints, enabled by setting ADMIN_TOKEN."""
+
+import asyncio
+import hmac
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Path, Query
+from fastapi.responses import PlainTextResponse
+
+from app import config
+from app.delivery import DEFAULT_PREFERENCES, broadcast
+from app.profiler import ProfilerBusy, collapse, profiler
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None, description="Value of ADMIN_TOKEN")):
+    """Reject requests without the admin token; hide the endpoints if none is set."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Compare bytes: compare_digest rejects non-ASCII str, and Starlette
+    # decodes header bytes as latin-1, so encoding back gives what was sent.
+    sent = None if x_admin_token is None else x_admin_token.encode("latin-1")
+    if sent is None or not hmac.compare_digest(sent, config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile", response_class=PlainTextResponse, summary="Profile route handlers")
+async def profile(
+    seconds: float = Query(5, gt=0, le=60, description="How long to sample for"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Time between samples"),
+    all_stacks: bool = Query(False, description="Also keep stacks outside requests, under (no route)"),
+):
+    """Sample this worker's stacks for a while and return them as collapsed stacks.
+
+    Each line is a route followed by its frames, root first, and the number
+    of samples seen in it; feed the output to flamegraph.pl or speedscope.
+    """
+    try:
+        counts = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000, all_stacks)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapse(counts))
+
+
+@router.post("/notifications/{topic}", summary="Notify every subscriber of a topic")
+async def notify_topic(
+    topic: str = Path(..., description="Preference field, e.g. promotions"),
+    message: Dict[str, Any] = Body(..., description="Payload delivered to each subscriber"),
+):
+    """Queue `message` for every user subscribed to `topic`, on their chosen channel.
+
+    Returns once all of them are queued, waiting for room in full queues
+    instead of dropping notifications.
+    """
+    if topic not in DEFAULT_PREFERENCES:
+        raise HTTPException(status_code=404, detail=f"Unknown topic {topic!r}")
+    return {"topic": topic, "queued": await broadcast(topic, message)}
@@ -1,27 +1,38 @@
 """Authentication endpoints."""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime
+from typing import Dict
 
+from app import config
 from app.models import User, LoginRequest, RegisterRequest
-from app.database import users_db, next_user_id
+from app.database import DuplicateKeyError, users_db, get_user_by_email
+from app.security import DUMMY_HASH, current_user, hash_password_async, tokens, verify_password_async
+from app.validation import JSONBodyRoute
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=JSONBodyRoute)
 
 
 @router.post("/login", status_code=200, summary="Login")
 async def login(credentials: LoginRequest):
-    """Authenticate a user (endpoint with password field)."""
-    # Demo: Check if user exists (in real app, verify password hash)
-    user = next((u for u in users_db if u["email"] == credentials.email), None)
-    if not user:
+    """Check a user's password and issue a signed access token.
+
+    Send the token as `Authorization: Bearer <token>`.
+    """
+    user = get_user_by_email(credentials.email)
+    # Users created without a password cannot log in; check the dummy hash
+    # anyway so the response time does not reveal which emails exist.
+    stored = user.get("password_hash") if user else None
+    valid = await verify_password_async(credentials.password, stored or DUMMY_HASH)
+    if not (valid and stored):
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    
+
+    token, _ = tokens.issue(user["id"])
     return {
-        "access_token": f"demo_token_{user['id']}",
+        "access_token": token,
         "token_type": "bearer",
         "user_id": user["id"],
-        "expires_in": 3600
+        "expires_in": int(config.TOKEN_TTL)
     }
 
 
@@ -31,19 +42,29 @@ async def register(user_data: RegisterRequest):
     # Validate password match
     if user_data.password != user_data.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
-    
+
     # Check if email already exists
-    if any(u["email"] == user_data.email for u in users_db):
+    if get_user_by_email(user_data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    global next_user_id
+
+    password_hash = await hash_password_async(user_data.password)
     new_user = {
-        "id": next_user_id,
+        "id": users_db.next_id(),
         "name": user_data.name,
         "email": user_data.email,
         "age": user_data.age,
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "password_hash": password_hash,
     }
-    users_db.append(new_user)
-    next_user_id += 1
+    try:
+        users_db.insert(new_user)
+    except DuplicateKeyError:
+        # Registered by another request while the password was hashing.
+        raise HTTPException(status_code=400, detail="Email already registered")
     return new_user
+
+
+@router.get("/me", response_model=User, summary="Get the authenticated user")
+async def me(user: Dict = Depends(current_user)):
+    """Return the user an access token was issued to."""
+    return user
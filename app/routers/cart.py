@@ -1,13 +1,24 @@
 """Cart endpoints."""
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-from datetime import datetime
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Path, Query
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
 
-from app.models import Cart, CartCreate
-from app.database import products_db, carts_db, next_cart_id
+from app import config
+from app.models import Cart, CartCreate, CartOperation, CartOperationType, CartUpdate
+from app.database import carts_db, get_cart_by_id, get_carts_for_user, get_products_by_ids, get_user_by_id, transaction
+from app.pricing import line_totals, from_cents, to_cents
+from app.validation import JSONBodyRoute
 
-router = APIRouter(prefix="/cart", tags=["cart"])
+router = APIRouter(prefix="/cart", tags=["cart"], route_class=JSONBodyRoute)
+
+logger = logging.getLogger(__name__)
+
+MAX_LINES = 50
+MAX_QUANTITY = 100
+SWEEP_BATCH = 1_000
 
 
 @router.post("", response_model=Cart, status_code=201, summary="Create shopping cart")
@@ -15,38 +26,168 @@ async def create_cart(
     cart: CartCreate,
     user_id: Optional[int] = Query(None, gt=0)
 ):
-    """Create a shopping cart (endpoint with nested list models)."""
+    """Create a shopping cart (endpoint with nested list models).
+
+    Items for the same product are merged into one line.
+    """
     # Validate all products exist
-    product_ids = [item.product_id for item in cart.items]
-    products = {p["id"]: p for p in products_db if p["id"] in product_ids}
-    
-    if len(products) != len(product_ids):
-        missing = set(product_ids) - set(products.keys())
+    quantities: Dict[int, int] = {}
+    for item in cart.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    products = get_products_by_ids(list(quantities))
+
+    if len(products) != len(quantities):
+        missing = set(quantities) - set(products.keys())
         raise HTTPException(status_code=404, detail=f"Products not found: {missing}")
-    
+
     # Calculate total
-    cart_items = []
-    total = 0.0
-    for item in cart.items:
-        product = products[item.product_id]
-        item_total = product["price"] * item["quantity"]
-        total += item_total
-        cart_items.append({
-            "product_id": item.product_id,
-            "quantity": item["quantity"],
-            "price": product["price"],
-            "subtotal": item_total
-        })
-    
-    global next_cart_id
+    prices = [products[product_id]["price"] for product_id in quantities]
+    subtotals, total_cents = line_totals(prices, list(quantities.values()))
+    cart_items = [
+        {
+            "product_id": product_id,
+            "quantity": quantity,
+            "price": price,
+            "subtotal": from_cents(subtotal)
+        }
+        for (product_id, quantity), price, subtotal in zip(quantities.items(), prices, subtotals)
+    ]
+
+    now = datetime.now()
     new_cart = {
-        "cart_id": next_cart_id,
+        "cart_id": carts_db.next_id(),
         "user_id": user_id,
         "items": cart_items,
-        "total": round(total, 2),
+        "total": from_cents(total_cents),
+        "total_cents": total_cents,
         "coupon_code": cart.coupon_code,
-        "created_at": datetime.now()
+        "created_at": now,
+        "updated_at": now,
     }
-    carts_db.append(new_cart)
-    next_cart_id += 1
+    carts_db.insert(new_cart)
     return new_cart
+
+
+@router.get("", response_model=List[Cart], summary="List carts for user")
+async def list_user_carts(
+    user_id: int = Query(..., gt=0)
+):
+    """List all carts belonging to a user."""
+    if not get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    return get_carts_for_user(user_id)
+
+
+@router.get("/{cart_id}", response_model=Cart, summary="Get cart by ID")
+async def get_cart(
+    cart_id: int = Path(..., gt=0)
+):
+    """Get a specific cart by ID."""
+    cart = get_cart_by_id(cart_id)
+    if not cart:
+        raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+    return cart
+
+
+def _apply_operations(cart: Dict, operations: List[CartOperation]) -> Tuple[List[Dict], int]:
+    """Apply line operations to a cart; return its new lines and total in cents.
+
+    Only the lines touched are repriced, each adjusting the total by the
+    change in its subtotal. Lines are replaced, never modified in place.
+    """
+    lines = {line["product_id"]: line for line in cart["items"]}
+    total_cents = cart.get("total_cents", to_cents(cart["total"]))
+    products = get_products_by_ids([op.product_id for op in operations if op.product_id not in lines])
+
+    for op in operations:
+        line = lines.get(op.product_id)
+        old_quantity = line["quantity"] if line else 0
+        if op.op == CartOperationType.REMOVE:
+            quantity = 0
+        elif op.quantity is None:
+            raise HTTPException(status_code=422, detail=f"Operation {op.op.value} needs a quantity")
+        elif op.op == CartOperationType.ADD:
+            quantity = old_quantity + op.quantity
+        else:
+            quantity = op.quantity
+        if quantity > MAX_QUANTITY:
+            raise HTTPException(
+                status_code=400, detail=f"Quantity of product {op.product_id} would exceed {MAX_QUANTITY}"
+            )
+
+        if line is None:
+            if op.op == CartOperationType.REMOVE:
+                raise HTTPException(status_code=404, detail=f"Product {op.product_id} is not in the cart")
+            if quantity == 0:
+                continue
+            product = products.get(op.product_id)
+            if product is None:
+                raise HTTPException(status_code=404, detail=f"Product {op.product_id} not found")
+            price = product["price"]
+        else:
+            price = line["price"]
+
+        price_cents = to_cents(price)
+        total_cents += price_cents * (quantity - old_quantity)
+        if quantity:
+            lines[op.product_id] = {
+                "product_id": op.product_id,
+                "quantity": quantity,
+                "price": price,
+                "subtotal": from_cents(price_cents * quantity),
+            }
+        else:
+            del lines[op.product_id]
+
+    if len(lines) > MAX_LINES:
+        raise HTTPException(status_code=400, detail=f"A cart holds at most {MAX_LINES} lines")
+    return list(lines.values()), total_cents
+
+
+@router.patch("/{cart_id}", response_model=Cart, summary="Update cart lines")
+async def update_cart(
+    cart_id: int = Path(..., gt=0),
+    update: CartUpdate = ...
+):
+    """Add, set or remove cart lines and change the coupon, all or nothing.
+
+    `add` increases a line's quantity (creating the line at the current
+    price), `set` replaces it (0 removes the line) and `remove` drops it.
+    """
+    with transaction():
+        cart = get_cart_by_id(cart_id)
+        if not cart:
+            raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+        items, total_cents = _apply_operations(cart, update.operations)
+        changes = {
+            "items": items,
+            "total": from_cents(total_cents),
+            "total_cents": total_cents,
+            "updated_at": datetime.now(),
+        }
+        if "coupon_code" in update.model_fields_set:
+            changes["coupon_code"] = update.coupon_code
+        return carts_db.update(cart_id, changes)
+
+
+@router.delete("/{cart_id}", status_code=204, summary="Delete cart")
+async def delete_cart(
+    cart_id: int = Path(..., gt=0)
+):
+    """Delete a cart."""
+    if not carts_db.delete(cart_id):
+        raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+    return None
+
+
+async def sweep_expired_carts() -> None:
+    """Every CART_SWEEP_INTERVAL seconds, delete carts idle for over CART_TTL seconds."""
+    while True:
+        await asyncio.sleep(config.CART_SWEEP_INTERVAL)
+        cutoff = datetime.now() - timedelta(seconds=config.CART_TTL)
+        try:
+            while carts_db.expire("updated_at", cutoff, SWEEP_BATCH) == SWEEP_BATCH:
+                # Let requests run between batches of a large sweep.
+                await asyncio.sleep(0)
+        except Exception:
+            logger.exception("Cart sweep failed")
@@ -4,9 +4,20 @@ from fastapi import APIRouter, HTTPException, Path
 from datetime import datetime
 
 from app.models import NotificationPreferences
-from app.database import users_db
+from app.database import get_notification_preferences, get_user_by_id, save_notification_preferences
+from app.delivery import DEFAULT_PREFERENCES
+from app.validation import JSONBodyRoute
 
-router = APIRouter(tags=["notifications"])
+router = APIRouter(tags=["notifications"], route_class=JSONBodyRoute)
+
+
+def _response(user_id: int, row: dict | None) -> dict:
+    row = row or {}
+    return {
+        "user_id": user_id,
+        "preferences": {topic: row.get(topic, default) for topic, default in DEFAULT_PREFERENCES.items()},
+        "updated_at": row.get("updated_at"),
+    }
 
 
 @router.post("/users/{user_id}/notifications/preferences", status_code=200, summary="Update notification preferences")
@@ -14,13 +25,24 @@ async def update_notification_preferences(
     user_id: int = Path(..., gt=0),
     preferences: NotificationPreferences = ...
 ):
-    """Update user notification preferences (endpoint with enum types)."""
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    """Update user notification preferences (endpoint with enum types).
+
+    Notifications on each topic go out on the channel chosen for it, or not
+    at all for "none".
+    """
+    user = get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-    
-    return {
-        "user_id": user_id,
-        "preferences": preferences.model_dump(),
-        "updated_at": datetime.now().isoformat()
-    }
+
+    row = save_notification_preferences(
+        user_id, {**preferences.model_dump(mode="json"), "updated_at": datetime.now().isoformat()}
+    )
+    return _response(user_id, row)
+
+
+@router.get("/users/{user_id}/notifications/preferences", status_code=200, summary="Get notification preferences")
+async def get_notification_preferences_for_user(user_id: int = Path(..., gt=0)):
+    """Get user notification preferences; the defaults until the user saves any."""
+    if not get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    return _response(user_id, get_notification_preferences(user_id))
@@ -1,39 +1,265 @@
 """Order endpoints."""
 
-from fastapi import APIRouter, HTTPException
+import hashlib
+from fastapi import APIRouter, Header, HTTPException, Path, Query, Response
+from typing import Dict, List, Optional
 from datetime import datetime
 
-from app.models import OrderCreate, OrderResponse, Product
-from app.database import users_db, products_db
+from app.models import CheckoutRequest, OrderCreate, OrderResponse
+from app.database import (
+    DuplicateKeyError,
+    carts_db,
+    orders_db,
+    release_stock,
+    reserve_stock,
+    sync_tables,
+    get_cart_by_id,
+    get_order_by_id,
+    get_order_by_idempotency_key,
+    get_order_for_cart,
+    get_user_by_id,
+    get_products_by_ids,
+)
+from app.delivery import notify
+from app.pricing import line_totals, from_cents, to_cents
+from app.query import query_orders, query_user_orders
+from app.serialization import rows_response
+from app.validation import JSONBodyRoute
 
-router = APIRouter(prefix="/orders", tags=["orders"])
+router = APIRouter(tags=["orders"], route_class=JSONBodyRoute)
 
 
-@router.post("", response_model=OrderResponse, status_code=201, summary="Create an order")
-async def create_order(order: OrderCreate):
-    """Create an order (complex endpoint with nested body schema - OrderItem list and Address)."""
+def _replay(existing: dict, request_hash: str, response: Response) -> dict:
+    """Return the order stored under an Idempotency-Key if it was for the same request."""
+    if existing["request_hash"] != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different order")
+    response.headers["Idempotent-Replayed"] = "true"
+    return existing
+
+
+def _reserve(quantities: Dict[int, int], products: Dict[int, dict]) -> None:
+    """Reserve stock for an order, or fail with 409 naming the short products."""
+    if not reserve_stock(quantities):
+        short = sorted(
+            pid for pid, quantity in quantities.items()
+            if products[pid].get("stock") is not None and products[pid]["stock"] < quantity
+        )
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for products: {short or sorted(quantities)}")
+
+
+def _stored_time(value: Optional[datetime]) -> Optional[str]:
+    """`value` in the naive local-time ISO format created_at is stored in."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
+
+def _place(new_order: dict, quantities: Dict[int, int]) -> Optional[dict]:
+    """Store an order whose stock is reserved; None if a unique key was taken first.
+
+    On a conflict the reservation is released and shared tables are synced,
+    so the order that won can be looked up. A stored order is announced to
+    its user in the background.
+    """
+    try:
+        orders_db.insert(new_order)
+    except DuplicateKeyError:
+        release_stock(quantities)
+        sync_tables()
+        return None
+    notify(new_order["user_id"], "order_updates", {
+        "event": "order_created", "order_id": new_order["order_id"], "total": new_order["total"],
+    })
+    return new_order
+
+
+def _new_order(user_id: int, products: List[dict], items: List[dict], total_cents: int, details: OrderCreate | CheckoutRequest, **keys) -> dict:
+    return {
+        "order_id": orders_db.next_id(),
+        "user_id": user_id,
+        "products": products,
+        "items": items,
+        "total": from_cents(total_cents),
+        "notes": details.notes,
+        "shipping_address": details.shipping_address.model_dump() if details.shipping_address else None,
+        "payment_method": details.payment_method,
+        "created_at": datetime.now().isoformat(),
+        **keys,
+    }
+
+
+@router.post("/orders", response_model=OrderResponse, status_code=201, summary="Create an order")
+async def create_order(
+    order: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, max_length=255, description="Retries with the same key return the original order instead of creating another"
+    ),
+):
+    """Create an order (complex endpoint with nested body schema - OrderItem list and Address).
+
+    Units of products with a stock level are reserved; 409 if any is short.
+    """
+    request_hash = hashlib.sha256(order.model_dump_json().encode()).hexdigest()
+    if idempotency_key:
+        existing = get_order_by_idempotency_key(idempotency_key)
+        if existing:
+            return _replay(existing, request_hash, response)
+
     # Validate user exists
-    user = next((u for u in users_db if u["id"] == order.user_id), None)
+    user = get_user_by_id(order.user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {order.user_id} not found")
-    
+
     # Validate products exist and calculate totals
-    products = []
-    total = 0.0
-    
+    found = get_products_by_ids([item.product_id for item in order.items])
     for item in order.items:
-        product = next((p for p in products_db if p["id"] == item.productId), None)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.productId} not found")
-        
-        products.append(product)
-        total += product["price"] * item.quantity
-    
-    return {
-        "order_id": len(products_db) + 1,
-        "user_id": order.user_id,
-        "products": products,
-        "total": round(total, 2),
-        "notes": order.notes,
-        "created_at": datetime.now().isoformat()
-    }
+        if item.product_id not in found:
+            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+
+    # Snapshot the products as the client saw them, before the reservation
+    # changes their stock.
+    products = [dict(found[item.product_id]) for item in order.items]
+    quantities: Dict[int, int] = {}
+    for item in order.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    _reserve(quantities, found)
+
+    _, total_cents = line_totals([p["price"] for p in products], [item.quantity for item in order.items])
+    new_order = _new_order(
+        order.user_id, products, [item.model_dump() for item in order.items], total_cents, order,
+        idempotency_key=idempotency_key or None, request_hash=request_hash,
+    )
+    if _place(new_order, quantities) is None:
+        # Another worker committed an order under the same key first.
+        existing = get_order_by_idempotency_key(idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Order conflicts with an existing order")
+        return _replay(existing, request_hash, response)
+    return new_order
+
+
+@router.post(
+    "/cart/{cart_id}/checkout", response_model=OrderResponse, status_code=201, tags=["cart"], summary="Check out a cart"
+)
+async def checkout_cart(
+    response: Response,
+    cart_id: int = Path(..., gt=0),
+    checkout: Optional[CheckoutRequest] = None,
+):
+    """Turn a cart into an order, reserving stock for all of its lines at once.
+
+    The order keeps the cart's prices and the cart is deleted. A user_id in
+    the body must be the cart's owner (403 otherwise) and is only needed for
+    a cart without one. 409 if the cart is empty or any product is short of
+    stock, in which case nothing is reserved. Checking
+    out the same cart again returns its order with Idempotent-Replayed set.
+    """
+    checkout = checkout or CheckoutRequest()
+    existing = get_order_for_cart(cart_id)
+    if existing:
+        response.headers["Idempotent-Replayed"] = "true"
+        return existing
+    cart = get_cart_by_id(cart_id)
+    if not cart:
+        raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+    if not cart["items"]:
+        # PATCH can remove every line; an empty cart is not an order.
+        raise HTTPException(status_code=409, detail=f"Cart {cart_id} is empty")
+
+    user_id = cart["user_id"] or checkout.user_id
+    if user_id is None:
+        raise HTTPException(status_code=422, detail="Cart has no owner; checkout needs a user_id")
+    if checkout.user_id is not None and checkout.user_id != user_id:
+        raise HTTPException(status_code=403, detail=f"Cart {cart_id} belongs to another user")
+    if not get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+
+    quantities = {line["product_id"]: line["quantity"] for line in cart["items"]}
+    found = get_products_by_ids(list(quantities))
+    if len(found) != len(quantities):
+        raise HTTPException(status_code=404, detail=f"Products not found: {set(quantities) - set(found)}")
+    # Snapshot the products before the reservation changes their stock, at
+    # the cart's prices, which make up its total.
+    products = [{**found[line["product_id"]], "price": line["price"]} for line in cart["items"]]
+    _reserve(quantities, found)
+
+    new_order = _new_order(
+        user_id,
+        products,
+        [{"product_id": pid, "quantity": quantity, "special_instructions": None} for pid, quantity in quantities.items()],
+        cart.get("total_cents", to_cents(cart["total"])),
+        checkout,
+        cart_id=cart_id,
+        idempotency_key=None,
+        request_hash=hashlib.sha256(checkout.model_dump_json().encode()).hexdigest(),
+    )
+    if _place(new_order, quantities) is None:
+        # A concurrent checkout of the same cart won.
+        existing = get_order_for_cart(cart_id)
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Order conflicts with an existing order")
+        response.headers["Idempotent-Replayed"] = "true"
+        return existing
+    carts_db.delete(cart_id)
+    return new_order
+
+
+@router.get("/orders", response_model=List[OrderResponse], summary="List orders by creation time")
+async def list_orders(
+    response: Response,
+    since: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only orders created at or before this time"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header")
+):
+    """List orders, oldest first, optionally within a creation time range.
+
+    When more orders follow, the X-Next-Cursor response header holds a
+    cursor for the next page.
+    """
+    try:
+        result, next_cursor = query_orders(_stored_time(since), _stored_time(until), skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(result, OrderResponse, many=True, headers=response.headers)
+
+
+@router.get("/orders/{order_id}", response_model=OrderResponse, summary="Get order by ID")
+async def get_order(
+    order_id: int = Path(..., gt=0)
+):
+    """Get a specific order by ID."""
+    order = get_order_by_id(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
+    return rows_response(order, OrderResponse)
+
+
+@router.get("/users/{user_id}/orders", response_model=List[OrderResponse], summary="List orders for user")
+async def list_user_orders(
+    response: Response,
+    user_id: int = Path(..., gt=0),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header")
+):
+    """List a user's orders in ID order.
+
+    When more orders follow, the X-Next-Cursor response header holds a
+    cursor for the next page.
+    """
+    if not get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    try:
+        result, next_cursor = query_user_orders(user_id, skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(result, OrderResponse, many=True, headers=response.headers)
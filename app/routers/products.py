@@ -1,52 +1,92 @@
 """Product endpoints."""
 
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 
-from app.models import Product, ProductCreate
-from app.database import products_db, next_product_id
+from app.bulk import bulk_body_schema, export_ndjson, ingest
+from app.models import Product, ProductCreate, ProductDetail
+from app.database import products_db, get_product_by_id, get_review_summary
+from app.query import query_products
+from app.serialization import rows_response
+from app.validation import JSONBodyRoute, request_adapter
 
-router = APIRouter(prefix="/products", tags=["products"])
+router = APIRouter(prefix="/products", tags=["products"], route_class=JSONBodyRoute)
+
+product_list_adapter = request_adapter(List[ProductCreate])
 
 
 @router.get("", response_model=List[Product], summary="List all products")
 async def list_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
-    in_stock: Optional[bool] = Query(None)
+    in_stock: Optional[bool] = Query(None),
+    search: Optional[str] = Query(None, description="Search products by name or description"),
+    prefix: bool = Query(False, description="Only match search at the start of a word"),
+    rank: bool = Query(False, description="Order search results by relevance instead of ID"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header")
 ):
-    """List products with filtering."""
-    result = products_db[skip:skip+limit]
-    if min_price is not None:
-        result = [p for p in result if p["price"] >= min_price]
-    if max_price is not None:
-        result = [p for p in result if p["price"] <= max_price]
-    if in_stock is not None:
-        result = [p for p in result if p["in_stock"] == in_stock]
-    return result
-
-
-@router.get("/{product_id}", response_model=Product, summary="Get product by ID")
+    """List products with filtering.
+
+    Filters are applied before pagination. Search results are ordered by
+    product ID (or relevance), other price-filtered results by price, and
+    everything else by product ID. When more products follow, the
+    X-Next-Cursor response header holds a cursor for the next page.
+    """
+    try:
+        result, next_cursor = query_products(
+            min_price, max_price, in_stock, skip, limit, cursor, search, prefix, rank
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(result, Product, many=True, headers=response.headers)
+
+
+@router.get("/export", response_class=StreamingResponse, summary="Export all products as NDJSON")
+async def export_products():
+    """Stream every product as newline-delimited JSON, in ID order."""
+    return StreamingResponse(export_ndjson(products_db, Product), media_type="application/x-ndjson")
+
+
+@router.get("/{product_id}", response_model=ProductDetail, summary="Get product by ID")
 async def get_product(
     product_id: int = Path(..., gt=0)
 ):
-    """Get a specific product by ID."""
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    """Get a specific product by ID, with its review summary."""
+    product = get_product_by_id(product_id)
     if not product:
         raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
-    return product
+    return rows_response({**product, "review_summary": get_review_summary(product_id)}, ProductDetail)
+
+
+def _product_row(product: ProductCreate, product_id: Optional[int]) -> dict:
+    """Build a product row; a tracked stock level decides in_stock."""
+    row = {"id": product_id, **product.model_dump()}
+    if product.stock is not None:
+        row["in_stock"] = product.stock > 0
+    return row
 
 
 @router.post("", response_model=Product, status_code=201, summary="Create a new product")
 async def create_product(product: ProductCreate):
     """Create a new product."""
-    global next_product_id
-    new_product = {
-        "product_id": next_product_id,
-        **product.model_dump()
-    }
-    products_db.append(new_product)
-    next_product_id += 1
+    new_product = _product_row(product, products_db.next_id())
+    products_db.insert(new_product)
     return new_product
+
+
+@router.post("/bulk", status_code=200, summary="Create products in bulk", openapi_extra=bulk_body_schema(ProductCreate))
+async def create_products_bulk(request: Request):
+    """Create many products from a JSON array or a streamed NDJSON body.
+
+    Invalid rows are skipped and listed in the report.
+    """
+    return await ingest(
+        request, product_list_adapter, products_db,
+        lambda product: _product_row(product, None),
+    )
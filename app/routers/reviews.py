@@ -1,12 +1,16 @@
 """Review endpoints."""
 
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Response
 from datetime import datetime
+from typing import List, Optional
 
-from app.models import Review, ReviewCreate
-from app.database import users_db, products_db, reviews_db, next_review_id
+from app.models import Review, ReviewCreate, ReviewSummary
+from app.database import reviews_db, get_user_by_id, get_product_by_id, get_review_summary
+from app.query import query_reviews
+from app.serialization import rows_response
+from app.validation import JSONBodyRoute
 
-router = APIRouter(tags=["reviews"])
+router = APIRouter(tags=["reviews"], route_class=JSONBodyRoute)
 
 
 @router.post("/products/{product_id}/reviews", response_model=Review, status_code=201, summary="Create product review")
@@ -16,22 +20,54 @@ async def create_product_review(
     review: ReviewCreate = ...
 ):
     """Create a product review (endpoint with validation constraints)."""
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    product = get_product_by_id(product_id)
     if not product:
         raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
     
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    user = get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     
-    global next_review_id
     new_review = {
-        "id": next_review_id,
+        "id": reviews_db.next_id(),
         "product_id": product_id,
         "user_id": user_id,
         **review.model_dump(),
         "created_at": datetime.now()
     }
-    reviews_db.append(new_review)
-    next_review_id += 1
+    reviews_db.insert(new_review)
     return new_review
+
+
+@router.get("/products/{product_id}/reviews", response_model=List[Review], summary="List product reviews")
+async def list_product_reviews(
+    response: Response,
+    product_id: int = Path(..., gt=0),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header")
+):
+    """List a product's reviews in ID order.
+
+    When more reviews follow, the X-Next-Cursor response header holds a
+    cursor for the next page.
+    """
+    if not get_product_by_id(product_id):
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    try:
+        result, next_cursor = query_reviews(product_id, skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(result, Review, many=True, headers=response.headers)
+
+
+@router.get("/products/{product_id}/reviews/summary", response_model=ReviewSummary, summary="Get product review summary")
+async def get_product_review_summary(
+    product_id: int = Path(..., gt=0)
+):
+    """Get a product's review count, rating sum, average, 1-5 histogram and verified count."""
+    if not get_product_by_id(product_id):
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    return get_review_summary(product_id)
@@ -1,26 +1,50 @@
 """User endpoints."""
 
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 
+from app.bulk import bulk_body_schema, export_ndjson, ingest
 from app.models import User, UserCreate, UserUpdate
-from app.database import users_db, next_user_id
+from app.database import users_db, get_user_by_id, DuplicateKeyError
+from app.query import query_users
+from app.serialization import rows_response
+from app.validation import JSONBodyRoute, request_adapter
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=JSONBodyRoute)
+
+user_list_adapter = request_adapter(List[UserCreate])
 
 
 @router.get("", response_model=List[User], summary="List all users")
 async def list_users(
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of users to skip"),
     limit: int = Query(10, ge=1, le=100, description="Maximum number of users to return"),
-    search: Optional[str] = Query(None, description="Search users by name")
+    search: Optional[str] = Query(None, description="Search users by name"),
+    prefix: bool = Query(False, description="Only match search at the start of a word"),
+    rank: bool = Query(False, description="Order search results by relevance instead of ID"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header")
 ):
-    """List all users with pagination and search."""
-    result = users_db[skip:skip+limit]
-    if search:
-        result = [u for u in result if search.lower() in u["name"].lower()]
-    return result
+    """List all users with pagination and search.
+
+    When more users follow, the X-Next-Cursor response header holds a cursor
+    for the next page.
+    """
+    try:
+        result, next_cursor = query_users(skip, limit, cursor, search, prefix, rank)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(result, User, many=True, headers=response.headers)
+
+
+@router.get("/export", response_class=StreamingResponse, summary="Export all users as NDJSON")
+async def export_users():
+    """Stream every user as newline-delimited JSON, in ID order."""
+    return StreamingResponse(export_ndjson(users_db, User), media_type="application/x-ndjson")
 
 
 @router.get("/{user_id}", response_model=User, summary="Get user by ID")
@@ -28,39 +52,54 @@ async def get_user(
     user_id: int = Path(..., description="User ID", gt=0)
 ):
     """Get a specific user by ID."""
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    user = get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-    return user
+    return rows_response(user, User)
 
 
 @router.post("", response_model=User, status_code=201, summary="Create a new user")
 async def create_user(user: UserCreate):
     """Create a new user."""
-    global next_user_id
     new_user = {
-        "id": next_user_id,
+        "id": users_db.next_id(),
         **user.model_dump(),
         "created_at": datetime.now()
     }
-    users_db.append(new_user)
-    next_user_id += 1
+    try:
+        users_db.insert(new_user)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     return new_user
 
 
+@router.post("/bulk", status_code=200, summary="Create users in bulk", openapi_extra=bulk_body_schema(UserCreate))
+async def create_users_bulk(request: Request):
+    """Create many users from a JSON array or a streamed NDJSON body.
+
+    Invalid rows and duplicate emails are skipped and listed in the report.
+    """
+    return await ingest(
+        request, user_list_adapter, users_db,
+        lambda user: {"id": None, **user.model_dump(), "created_at": datetime.now()},
+    )
+
+
 @router.put("/{user_id}", response_model=User, summary="Update user")
 async def update_user(
     user_id: int = Path(..., description="User ID", gt=0),
     user_update: UserUpdate = ...
 ):
     """Update an existing user."""
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    user = get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     
     update_data = user_update.model_dump(exclude_unset=True)
-    user.update(update_data)
-    return user
+    try:
+        return users_db.update(user_id, update_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
 
 
 @router.delete("/{user_id}", status_code=204, summary="Delete user")
@@ -68,9 +107,7 @@ async def delete_user(
     user_id: int = Path(..., description="User ID", gt=0)
 ):
     """Delete a user."""
-    global users_db
-    user = next((u for u in users_db if u["id"] == user_id), None)
+    user = users_db.delete(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-    users_db = [u for u in users_db if u["id"] != user_id]
     return None
@@ -0,0 +1,115 @@
+"""Trigram inverted index for substring and prefix text search."""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+_EMPTY: Set[int] = set()
+
+
+def _normalize(text: str) -> str:
+    """Lowercase, collapse whitespace and pad with spaces to mark word edges."""
+    return " " + " ".join(text.lower().split()) + " "
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from the trigrams of a text field to row ids.
+
+    Texts are padded with spaces, so a prefix query is a substring query for
+    " " + query, and short values still produce trigrams. Every match is in
+    the id set of each of the query's trigrams; callers take the smallest as
+    candidates and verify each against the stored text with `matches`.
+    """
+
+    kind = "text"
+    unique = False
+
+    def __init__(self, field: str):
+        self.field = field
+        self.grams: Dict[str, Set[int]] = {}
+        self.texts: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct trigrams indexed."""
+        return len(self.grams)
+
+    def _needle(self, query: str, prefix: bool) -> str:
+        query = " ".join(query.lower().split())
+        return " " + query if prefix and query else query
+
+    def candidates(self, query: str, prefix: bool = False) -> Optional[Set[int]]:
+        """The smallest id set holding every row that may contain `query`.
+
+        None when the query is too short for a trigram, so any row may match.
+        The set belongs to the index; do not modify it.
+        """
+        needle = self._needle(query, prefix)
+        if not needle:
+            return _EMPTY
+        if len(needle) < 3:
+            return None
+        return min((self.grams.get(gram, _EMPTY) for gram in _trigrams(needle)), key=len)
+
+    def matches(self, query: str, row_id: int, prefix: bool = False) -> bool:
+        """Whether the row with `row_id` contains `query` (at a word start if `prefix`)."""
+        needle = self._needle(query, prefix)
+        return bool(needle) and needle in self.texts.get(row_id, "")
+
+    def score(self, query: str, row_id: int, prefix: bool = False) -> int:
+        """Relevance tier of a row for `query`; lower is better.
+
+        0 is an exact match, 1 matches at the start of the text, 2 at the
+        start of a word, 3 anywhere, and 4 means no match.
+        """
+        text = self.texts.get(row_id)
+        needle = self._needle(query, prefix).strip()
+        if text is None or not needle or needle not in text:
+            return 4
+        if text == f" {needle} ":
+            return 0
+        if text.startswith(f" {needle}"):
+            return 1
+        if f" {needle}" in text:
+            return 2
+        return 3
+
+    def check(self, value: Any, row_id: int) -> None:
+        pass
+
+    def add(self, value: Any, row_id: int) -> None:
+        if not value:
+            return
+        text = _normalize(value)
+        self.texts[row_id] = text
+        for gram in _trigrams(text):
+            self.grams.setdefault(gram, set()).add(row_id)
+
+    def add_many(self, pairs: List[Tuple[Any, int]]) -> None:
+        # Tokenize each distinct value once and extend each gram's set once.
+        ids_by_value: Dict[str, List[int]] = {}
+        for value, row_id in pairs:
+            if value:
+                ids_by_value.setdefault(value, []).append(row_id)
+        grams = self.grams
+        for value, ids in ids_by_value.items():
+            text = _normalize(value)
+            self.texts.update(dict.fromkeys(ids, text))
+            for gram in _trigrams(text):
+                bucket = grams.get(gram)
+                if bucket is None:
+                    grams[gram] = set(ids)
+                else:
+                    bucket.update(ids)
+
+    def remove(self, value: Any, row_id: int) -> None:
+        text = self.texts.pop(row_id, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            ids = self.grams.get(gram)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self.grams[gram]
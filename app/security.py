@@ -0,0 +1,156 @@
+"""Password hashing and signed access tokens.
+
+Passwords are hashed with scrypt, which is deliberately slow, so hashing
+and checking run in a small dedicated thread pool instead of on the event
+loop; hashlib releases the GIL while it works, and the pool's size bounds
+how many CPUs logins can take. Access tokens are "<user id>.<expiry>.<HMAC>"
+signed with AUTH_SECRET, so any worker sharing the secret can check them
+without a lookup. Tokens already checked are kept in an LRU cache, which
+makes verifying a repeated token a dict lookup and an expiry comparison.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from fastapi import Header, HTTPException
+
+from app import config
+from app.database import get_user_by_id
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost: 2**14 iterations of 8-block mixing takes 16 MiB and tens of
+# milliseconds per hash. Stored hashes carry their parameters, so these can
+# be raised later without breaking existing passwords.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+_hash_pool = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+class InvalidToken(ValueError):
+    """Raised for a malformed, forged or expired access token."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with a fresh salt as "scrypt$n$r$p$salt$hash"."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a hash from `hash_password`, in constant time."""
+    try:
+        scheme, n, r, p, salt, digest = stored.split("$")
+        if scheme != "scrypt":
+            return False
+        expected = _b64decode(digest)
+        actual = hashlib.scrypt(
+            password.encode(), salt=_b64decode(salt), n=int(n), r=int(r), p=int(p), dklen=len(expected)
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+async def hash_password_async(password: str) -> str:
+    """`hash_password` in the password hashing pool."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+
+async def verify_password_async(password: str, stored: str) -> bool:
+    """`verify_password` in the password hashing pool."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, verify_password, password, stored)
+
+
+# Checked against when the user does not exist, so a login takes as long
+# whether or not the email is registered. No password matches it.
+DUMMY_HASH = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(bytes(16))}${_b64encode(bytes(64))}"
+
+
+class TokenSigner:
+    """Issues HMAC-signed access tokens and verifies them through an LRU cache."""
+
+    def __init__(self, secret: bytes, ttl: float, cache_size: int):
+        self.secret = secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id: int) -> Tuple[str, int]:
+        """Return a token for `user_id` and its expiry as a Unix timestamp."""
+        expires = int(time.time() + self.ttl)
+        payload = f"{user_id}.{expires}"
+        return f"{payload}.{self._sign(payload)}", expires
+
+    def verify(self, token: str) -> int:
+        """Return the user id a token was issued to; raise InvalidToken if it is not valid now."""
+        cached = self._cache.get(token)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(token)
+        else:
+            self.misses += 1
+            payload, _, signature = token.rpartition(".")
+            user_id, _, expires = payload.partition(".")
+            if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+                raise InvalidToken("Invalid token")
+            cached = (int(user_id), int(expires))
+            self._cache[token] = cached
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        user_id, expires = cached
+        if expires <= time.time():
+            self._cache.pop(token, None)
+            raise InvalidToken("Token expired")
+        return user_id
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def _secret() -> bytes:
+    if config.AUTH_SECRET:
+        return config.AUTH_SECRET.encode()
+    logger.warning("AUTH_SECRET is not set; tokens are only valid in this process until it restarts")
+    return secrets.token_bytes(32)
+
+
+tokens = TokenSigner(_secret(), config.TOKEN_TTL, config.TOKEN_CACHE_SIZE)
+
+
+async def current_user(authorization: Optional[str] = Header(None, description="Bearer access token")) -> Dict:
+    """Resolve the user of a `Bearer` access token from /auth/login; 401 otherwise."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        user = get_user_by_id(tokens.verify(token))
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    if user is None:
+        raise HTTPException(status_code=401, detail="User no longer exists", headers={"WWW-Authenticate": "Bearer"})
+    return user
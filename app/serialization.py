@@ -0,0 +1,126 @@
+"""Pre-built JSON serializers for stored rows.
+
+With FAST_JSON enabled, read endpoints return stored rows through
+`rows_response`, which encodes them straight to bytes with pydantic-core.
+Rows are validated when written, so the per-row `response_model`
+validation FastAPI would otherwise run on every read is skipped; only
+the missing optional fields are filled in, so the bytes still match
+what `response_model` would return.
+"""
+
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+from typing_extensions import TypedDict
+
+from app import config
+
+
+def _row_annotation(annotation: Any) -> Any:
+    """`annotation` with nested models replaced by their row TypedDicts."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _row_type(annotation)
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is list and args:
+        return List[_row_annotation(args[0])]
+    if origin is typing.Union:
+        return typing.Union[tuple(_row_annotation(arg) for arg in args)]
+    return annotation
+
+
+@lru_cache(maxsize=None)
+def _row_type(model: type[BaseModel]) -> type:
+    fields = {name: _row_annotation(field.annotation) for name, field in model.model_fields.items()}
+    return TypedDict(f"{model.__name__}Row", fields)
+
+
+def _value_filler(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Filler for a field value holding nested models, or None if it holds none."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return row_filler(annotation)
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is list and args:
+        fill = _value_filler(args[0])
+        if fill is not None:
+            return lambda values: [None if value is None else fill(value) for value in values]
+    if origin is typing.Union:
+        fills = [fill for arg in args if (fill := _value_filler(arg)) is not None]
+        if len(fills) == 1:
+            return fills[0]
+    return None
+
+
+@lru_cache(maxsize=None)
+def row_filler(model: type[BaseModel]) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    """Function returning a stored row as a dict of `model`'s fields, in model order.
+
+    Optional fields missing from the row get the model's default, as they
+    would when FastAPI validates the row into `response_model`; a missing
+    required field raises KeyError.
+    """
+    defaults, factories = {}, {}
+    for name, field in model.model_fields.items():
+        if field.default_factory is not None:
+            factories[name] = field.default_factory
+        elif not field.is_required():
+            defaults[name] = field.default
+    nested = {
+        name: fill for name, field in model.model_fields.items()
+        if (fill := _value_filler(field.annotation)) is not None
+    }
+    names = tuple(model.model_fields)
+
+    def fill(row: Mapping[str, Any]) -> Dict[str, Any]:
+        values = {
+            name: row[name] if name in row else defaults[name] if name in defaults else factories[name]()
+            for name in names
+        }
+        for name, fill_value in nested.items():
+            if values[name] is not None:
+                values[name] = fill_value(values[name])
+        return values
+
+    return fill
+
+
+@lru_cache(maxsize=None)
+def row_encoder(model: type[BaseModel]) -> Callable[[Mapping[str, Any]], bytes]:
+    """Function encoding a stored row dict to JSON with `model`'s fields.
+
+    Rows are plain dicts, so they are described by a TypedDict mirroring the
+    model: keys outside the model are dropped and values are coerced the way
+    `response_model` would, without building a model instance per row.
+    """
+    adapter, fill = TypeAdapter(_row_type(model)), row_filler(model)
+    return lambda row: adapter.dump_json(fill(row))
+
+
+@lru_cache(maxsize=None)
+def row_list_encoder(model: type[BaseModel]) -> Callable[[List[Mapping[str, Any]]], bytes]:
+    """Function encoding a list of stored row dicts to JSON with `model`'s fields."""
+    adapter, fill = TypeAdapter(List[_row_type(model)]), row_filler(model)
+    return lambda rows: adapter.dump_json([fill(row) for row in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with pydantic-core instead of json.dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def rows_response(content: Any, model: type[BaseModel], many: bool = False, headers: Mapping[str, str] | None = None):
+    """Encode a stored row, or a list of them if `many`, as a JSON response.
+
+    Returns `content` unchanged when FAST_JSON is off, leaving it to the
+    route's `response_model`.
+    """
+    if not config.FAST_JSON:
+        return content
+    encode = row_list_encoder(model) if many else row_encoder(model)
+    return Response(encode(content), media_type="application/json", headers=headers)
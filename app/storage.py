@@ -0,0 +1,523 @@
+"""Storage backends behind the in-memory tables.
+
+Tables always serve reads from their in-memory rows and indexes. A storage
+backend persists every write and, when it is shared between processes,
+reports writes made by other processes so each table can catch up.
+MemoryStorage keeps nothing; LogStorage keeps a single process's tables
+durable with a write-ahead log and snapshots; SQLiteStorage keeps rows in a
+SQLite file in WAL mode so several workers can run against one file.
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import pickle
+import queue
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+Change = Tuple[str, int, Optional[Dict]]
+
+
+class ConflictError(Exception):
+    """Raised when a write violates a unique constraint in storage."""
+
+
+class Storage:
+    """Persistence interface used by Table; this base implementation keeps nothing."""
+
+    shared = False
+    allocates_ids = False
+
+    def attach(self, table) -> Iterator[Dict]:
+        """Prepare storage for `table` and yield its persisted rows."""
+        return iter(())
+
+    def load(self, table) -> Iterator[Dict]:
+        """Yield every persisted row of `table` in id order."""
+        return iter(())
+
+    def reserve_ids(self, table, count: int) -> int:
+        """Reserve `count` consecutive ids and return the first; used if `allocates_ids`."""
+        raise NotImplementedError
+
+    def insert(self, table, rows: List[Dict]) -> List[int]:
+        """Persist new rows; return positions of rows rejected by a unique constraint."""
+        return []
+
+    def update(self, table, row: Dict) -> None:
+        """Persist the new contents of an existing row."""
+
+    def delete(self, table, row_id: int) -> None:
+        """Persist the removal of a row."""
+
+    def adjust(self, table, field: str, deltas: Dict[int, int], flag: Optional[str] = None) -> Optional[Dict[int, int]]:
+        """Persist adding `deltas` (by row id) to an integer field; return the new values.
+
+        Shared storage checks the stored values again and returns None,
+        writing nothing, if any row is gone or would drop below zero.
+        """
+        return {row_id: table.rows[row_id][field] + delta for row_id, delta in deltas.items()}
+
+    def poll(self) -> Optional[List[Change]]:
+        """Return (table, id, row or None) for writes made by other processes.
+
+        None means changes were missed and every table must be reloaded.
+        """
+        return []
+
+    def close(self) -> None:
+        """Release connections before the process forks workers."""
+
+    def after_fork(self) -> None:
+        """Set up a forked worker; it must not reuse the parent's resources."""
+
+
+class MemoryStorage(Storage):
+    """Process-local storage: rows only live in the tables themselves."""
+
+
+class LogStorage(Storage):
+    """Write-ahead log plus periodic snapshots for the in-memory tables.
+
+    Every write is appended to the current log segment as a framed pickle
+    record (length, CRC32, payload) with a single os.write, so it survives a
+    process crash at once. A background thread fsyncs the segment every
+    `fsync_interval` seconds when it is dirty, batching the cost of fsync
+    across all writes in that window.
+
+    After `snapshot_every` records the log is rotated and all tables are
+    written to a snapshot in the background; segments older than the
+    snapshot are then deleted. Startup loads the snapshot and replays the
+    segments after it, truncating a torn record at the tail of the log.
+
+    The snapshot thread copies rows shallowly while writes go on, so values
+    inside a row must be replaced through Table.update rather than mutated
+    in place. A row copied after the rotation may already hold a later
+    write; every record carries whole rows, so replaying the segment over
+    it gives the same result.
+
+    The directory is locked with flock until `close`: a second LogStorage
+    appending to the same log, in this process or another, would corrupt it.
+    """
+
+    HEADER = struct.Struct("<II")
+
+    def __init__(self, directory: str, fsync_interval: float = 0.01, snapshot_every: int = 100_000):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._tables: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._records = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, "LOCK"), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"{directory} is already open in another LogStorage")
+        self._recovered, self._next_ids, self._segment = self._recover()
+        self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="wal-fsync", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.flush)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"wal-{segment:08d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[4:-4]) for name in os.listdir(self.directory)
+            if name.startswith("wal-") and name.endswith(".log")
+        )
+
+    def _recover(self) -> Tuple[Dict[str, Dict[int, Dict]], Dict[str, int], int]:
+        """Rebuild table contents from the latest snapshot and the log after it."""
+        tables: Dict[str, Dict[int, Dict]] = {}
+        next_ids: Dict[str, int] = {}
+        first_segment = 0
+        snapshot_path = os.path.join(self.directory, "snapshot.bin")
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            first_segment = snapshot["segment"]
+            next_ids = snapshot["next_ids"]
+            for name, rows in snapshot["tables"].items():
+                key = snapshot["keys"][name]
+                tables[name] = {row[key]: row for row in rows}
+
+        segments = [segment for segment in self._segments() if segment >= first_segment]
+        for segment in segments:
+            for op, name, key, payload in self._read_segment(self._segment_path(segment)):
+                rows = tables.setdefault(name, {})
+                if op == "insert":
+                    for row in payload:
+                        rows[row[key]] = row
+                        next_ids[name] = max(next_ids.get(name, 1), row[key] + 1)
+                elif op == "update":
+                    rows[payload[key]] = payload
+                elif op == "update_many":
+                    for row in payload:
+                        rows[row[key]] = row
+                elif op == "delete":
+                    rows.pop(payload, None)
+        return tables, next_ids, (segments[-1] if segments else first_segment)
+
+    def _read_segment(self, path: str) -> Iterator[Tuple[str, str, str, object]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + self.HEADER.size <= len(data):
+            length, crc = self.HEADER.unpack_from(data, offset)
+            start = offset + self.HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield pickle.loads(payload)
+            offset = start + length
+        if offset < len(data):
+            # A write torn by a crash: drop it so new records follow valid ones.
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def _append(self, record: Tuple[str, str, str, object]) -> None:
+        if self._records >= self.snapshot_every:
+            self.snapshot()
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        frame = self.HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            os.write(self._fd, frame)
+            self._dirty = True
+        self._records += 1
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._dirty:
+                    os.fsync(self._fd)
+                    self._dirty = False
+
+    def flush(self) -> None:
+        """fsync the log now instead of waiting for the background thread."""
+        with self._lock:
+            os.fsync(self._fd)
+            self._dirty = False
+
+    def close(self) -> None:
+        """Finish any snapshot, fsync and close the log, and release the directory lock."""
+        if self._closed.is_set():
+            return
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self._closed.set()
+        self._flush_thread.join()
+        atexit.unregister(self.flush)
+        with self._lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
+        os.close(self._lock_fd)
+
+    def snapshot(self, wait: bool = False) -> None:
+        """Rotate the log and write every table to a new snapshot.
+
+        Must be called between writes, with every logged write already
+        applied to the tables. Only references to the rows are taken here;
+        they are copied and the snapshot file written in a background thread,
+        which is waited for only if `wait` is set.
+        """
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        with self._lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._segment += 1
+            self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._dirty = False
+        self._records = 0
+        snapshot = {
+            "segment": self._segment,
+            "next_ids": {name: table.ids.next for name, table in self._tables.items()},
+            "keys": {name: table.primary_key for name, table in self._tables.items()},
+            "tables": {name: list(table.rows.values()) for name, table in self._tables.items()},
+        }
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=(snapshot,), name="wal-snapshot")
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
+
+    def _write_snapshot(self, snapshot: Dict) -> None:
+        snapshot["tables"] = {name: [dict(row) for row in rows] for name, rows in snapshot["tables"].items()}
+        path = os.path.join(self.directory, "snapshot.bin")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        for segment in self._segments():
+            if segment < snapshot["segment"]:
+                os.remove(self._segment_path(segment))
+
+    def attach(self, table) -> Iterator[Dict]:
+        self._tables[table.name] = table
+        table.ids.advance(self._next_ids.get(table.name, 1))
+        rows = self._recovered.pop(table.name, {})
+        return (rows[row_id] for row_id in sorted(rows))
+
+    def insert(self, table, rows: List[Dict]) -> List[int]:
+        self._append(("insert", table.name, table.primary_key, rows))
+        return []
+
+    def update(self, table, row: Dict) -> None:
+        self._append(("update", table.name, table.primary_key, row))
+
+    def delete(self, table, row_id: int) -> None:
+        self._append(("delete", table.name, table.primary_key, row_id))
+
+    def adjust(self, table, field: str, deltas: Dict[int, int], flag: Optional[str] = None) -> Optional[Dict[int, int]]:
+        values = super().adjust(table, field, deltas, flag)
+        rows = []
+        for row_id, value in values.items():
+            row = {**table.rows[row_id], field: value}
+            if flag:
+                row[flag] = value > 0
+            rows.append(row)
+        # One record, so a crash keeps all of the rows' changes or none.
+        self._append(("update_many", table.name, table.primary_key, rows))
+        return values
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _decode(obj: Dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def dumps(row: Dict) -> str:
+    return json.dumps(row, default=_encode, separators=(",", ":"))
+
+
+def loads(data: str) -> Dict:
+    return json.loads(data, object_hook=_decode)
+
+
+class SQLiteStorage(Storage):
+    """SQLite storage shared by every worker pointed at the same file.
+
+    Each table is stored as (id, JSON data) with an expression index per
+    hash or sorted table index, UNIQUE where the table index is. Ids come
+    from a shared sequences table. Every write also appends to a changes
+    log in the same transaction; poll() reads the entries of other processes
+    from it. Log entries older than CHANGE_RETENTION seconds are pruned; a
+    worker that falls further behind reloads its tables.
+    """
+
+    shared = True
+    allocates_ids = True
+
+    CHANGE_RETENTION = 3600
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self.origin = uuid.uuid4().hex
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._last_seq: Optional[int] = None
+        self._writes = 0
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, "
+                "row_id INTEGER NOT NULL, origin TEXT NOT NULL, at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS changes_at ON changes(at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (tbl TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly. Statements are
+        # fixed strings, so the per-connection statement cache reuses them.
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _log(self, conn: sqlite3.Connection, table, row_ids: List[int]) -> None:
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO changes (tbl, row_id, origin, at) VALUES (?, ?, ?, ?)",
+            [(table.name, row_id, self.origin, now) for row_id in row_ids],
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM changes WHERE at < ?", (now - self.CHANGE_RETENTION,))
+
+    def attach(self, table) -> Iterator[Dict]:
+        with self._transaction() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table.name}" (id INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+            for field, index in table.indexes.items():
+                if index.kind in ("hash", "sorted"):
+                    conn.execute(
+                        f'CREATE {"UNIQUE " if index.unique else ""}INDEX IF NOT EXISTS '
+                        f'"{table.name}_{field}" ON "{table.name}" (json_extract(data, \'$.{field}\'))'
+                    )
+            conn.execute(
+                f'INSERT OR IGNORE INTO sequences (tbl, next) '
+                f'SELECT ?, COALESCE(MAX(id), 0) + 1 FROM "{table.name}"',
+                (table.name,),
+            )
+            if self._last_seq is None:
+                # Changes committed after this point are replayed by poll();
+                # replaying one already loaded is harmless.
+                self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        return self.load(table)
+
+    def load(self, table) -> Iterator[Dict]:
+        with self._connection() as conn:
+            rows = conn.execute(f'SELECT data FROM "{table.name}" ORDER BY id').fetchall()
+        return (loads(data) for data, in rows)
+
+    def reserve_ids(self, table, count: int) -> int:
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE sequences SET next = next + ? WHERE tbl = ? RETURNING next - ?",
+                (count, table.name, count),
+            ).fetchone()[0]
+
+    def insert(self, table, rows: List[Dict]) -> List[int]:
+        sql = f'INSERT INTO "{table.name}" (id, data) VALUES (?, ?)'
+        params = [(row[table.primary_key], dumps(row)) for row in rows]
+        rejected: List[int] = []
+        with self._transaction() as conn:
+            conn.execute("SAVEPOINT batch")
+            try:
+                conn.executemany(sql, params)
+                written = [row_id for row_id, _ in params]
+            except sqlite3.IntegrityError:
+                # Another worker won a unique value: retry row by row to find it.
+                conn.execute("ROLLBACK TO batch")
+                written = []
+                for position, row_params in enumerate(params):
+                    try:
+                        conn.execute(sql, row_params)
+                        written.append(row_params[0])
+                    except sqlite3.IntegrityError:
+                        rejected.append(position)
+            conn.execute("RELEASE batch")
+            self._log(conn, table, written)
+        return rejected
+
+    def update(self, table, row: Dict) -> None:
+        row_id = row[table.primary_key]
+        try:
+            with self._transaction() as conn:
+                conn.execute(f'UPDATE "{table.name}" SET data = ? WHERE id = ?', (dumps(row), row_id))
+                self._log(conn, table, [row_id])
+        except sqlite3.IntegrityError as e:
+            raise ConflictError(str(e))
+
+    def delete(self, table, row_id: int) -> None:
+        with self._transaction() as conn:
+            conn.execute(f'DELETE FROM "{table.name}" WHERE id = ?', (row_id,))
+            self._log(conn, table, [row_id])
+
+    def adjust(self, table, field: str, deltas: Dict[int, int], flag: Optional[str] = None) -> Optional[Dict[int, int]]:
+        # The stored values are read and written under one write lock on the
+        # database, so no other worker's adjustment lands in between.
+        paths = f"'$.{field}', ?" + (f", '$.{flag}', json(?)" if flag else "")
+        values: Dict[int, int] = {}
+        with self._transaction() as conn:
+            for row_id in sorted(deltas):
+                found = conn.execute(
+                    f'SELECT json_extract(data, \'$.{field}\') FROM "{table.name}" WHERE id = ?', (row_id,)
+                ).fetchone()
+                if found is None or found[0] is None or found[0] + deltas[row_id] < 0:
+                    return None
+                values[row_id] = found[0] + deltas[row_id]
+            conn.executemany(
+                f'UPDATE "{table.name}" SET data = json_set(data, {paths}) WHERE id = ?',
+                [
+                    (value, "true" if value > 0 else "false", row_id) if flag else (value, row_id)
+                    for row_id, value in values.items()
+                ],
+            )
+            self._log(conn, table, list(values))
+        return values
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    def after_fork(self) -> None:
+        # A new origin, so this worker's writes are replayed by its siblings;
+        # changes are still polled from where the parent loaded the tables.
+        self.origin = uuid.uuid4().hex
+        for _ in range(self.pool_size):
+            self._pool.put(self._connect())
+
+    def poll(self) -> Optional[List[Change]]:
+        with self._connection() as conn:
+            entries = conn.execute(
+                "SELECT seq, tbl, row_id, origin FROM changes WHERE seq > ? ORDER BY seq",
+                (self._last_seq,),
+            ).fetchall()
+            if not entries:
+                return []
+            missed = entries[0][0] > self._last_seq + 1
+            self._last_seq = entries[-1][0]
+            if missed:
+                return None
+            latest: Dict[Tuple[str, int], None] = {}
+            for _, tbl, row_id, origin in entries:
+                if origin != self.origin:
+                    latest.pop((tbl, row_id), None)
+                    latest[(tbl, row_id)] = None
+            changes: List[Change] = []
+            for tbl, row_id in latest:
+                found = conn.execute(f'SELECT data FROM "{tbl}" WHERE id = ?', (row_id,)).fetchone()
+                changes.append((tbl, row_id, loads(found[0]) if found else None))
+        return changes
@@ -0,0 +1,102 @@
+"""Request body validation straight from the raw JSON bytes.
+
+FastAPI parses a JSON body into dicts and lists with json.loads and then
+validates that structure. With RAW_JSON_BODIES enabled, routes built with
+`JSONBodyRoute` instead hand the raw bytes to pydantic-core, which parses
+and validates them in one pass without the intermediate objects; for a
+50-item OrderCreate that roughly halves the cost. FastAPI then receives
+the finished model, which it accepts without validating it again.
+
+pydantic-core reports errors in JSON input with other `loc`, `type` and
+`msg` values than FastAPI's (for malformed JSON, a body that is not an
+object, "array" for "list", ...). A body that fails is therefore handed
+back to FastAPI to parse and validate again, so a 422 is exactly FastAPI's
+and only invalid requests pay for the second pass.
+
+Adapters are built once per body type and kept, so the core validator
+with its compiled patterns is ready before the first request.
+"""
+
+import email.message
+from functools import lru_cache
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.params import Form
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter, ValidationError
+
+from app import config
+from app.models import (
+    AddressCreate,
+    CartCreate,
+    CartUpdate,
+    CheckoutRequest,
+    LoginRequest,
+    NotificationPreferences,
+    OrderCreate,
+    ProductCreate,
+    RegisterRequest,
+    ReviewCreate,
+    UserCreate,
+    UserUpdate,
+)
+
+
+@lru_cache(maxsize=None)
+def request_adapter(annotation: Any) -> TypeAdapter:
+    """The TypeAdapter validating request bodies of type `annotation`, built once."""
+    return TypeAdapter(annotation)
+
+
+def _is_json(request: Request) -> bool:
+    content_type = request.headers.get("content-type")
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+class JSONBodyRoute(APIRoute):
+    """APIRoute validating its JSON body from raw bytes when RAW_JSON_BODIES is on.
+
+    Routes whose body is anything but a single JSON parameter are left to
+    FastAPI, as are requests that do not send JSON.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        body_params = self.dependant.body_params
+        if (
+            not config.RAW_JSON_BODIES
+            or len(body_params) != 1
+            or self._embed_body_fields
+            or isinstance(body_params[0].field_info, Form)
+        ):
+            return handler
+        adapter = request_adapter(body_params[0].field_info.annotation)
+
+        async def route_handler(request: Request) -> Response:
+            body = await request.body()
+            if body and _is_json(request):
+                try:
+                    # Starlette's Request.json() returns this cached value,
+                    # so FastAPI's own parsing is skipped.
+                    request._json = adapter.validate_json(body)
+                except ValidationError:
+                    # Left unset, so FastAPI parses and validates the body
+                    # itself and reports the errors in its own shape.
+                    pass
+            return await handler(request)
+
+        return route_handler
+
+
+# Build the validators of the request models up front.
+for _model in (
+    AddressCreate, CartCreate, CartUpdate, CheckoutRequest, LoginRequest, NotificationPreferences,
+    OrderCreate, ProductCreate, RegisterRequest, ReviewCreate, UserCreate, UserUpdate,
+):
+    request_adapter(_model)
@@ -0,0 +1 @@
+"""Benchmarks for the demo backend. Run modules with `python -m bench.<name>`."""
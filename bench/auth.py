@@ -0,0 +1,109 @@
+"""Benchmark logins, token verification and authenticated requests.
+
+Logins are driven concurrently through httpx's ASGITransport while a
+ticker task measures how late the event loop wakes it up. Password hashing
+runs in the hashing pool, so the lag should stay near zero however busy
+logins keep the pool. Then single token verifications are timed with the
+verified-token cache cold and warm, and GET /auth/me is driven with a
+handful of tokens.
+
+Run with `python -m bench.auth --logins 200 --concurrency 32`.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+
+import httpx
+
+from app import config
+from app.database import users_db
+from app.main import app
+from app.security import hash_password, tokens
+from bench.payloads import PASSWORD
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event, interval: float = 0.005) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def bench_logins(client: httpx.AsyncClient, emails: List[str], concurrency: int) -> None:
+    pending = iter(emails)
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        for email in pending:
+            response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+            failed += response.status_code != 200
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    lags.sort()
+    print(
+        f"login        {len(emails) / elapsed:>9.1f}/s  with {config.PASSWORD_HASH_WORKERS} hashing threads, "
+        f"{failed} failed; loop lag p50 {lags[len(lags) // 2] * 1000:.2f} ms, max {lags[-1] * 1000:.2f} ms"
+    )
+
+
+def bench_verify(count: int) -> None:
+    issued = [tokens.issue(user_id)[0] for user_id in range(1, count + 1)]
+    tokens._cache.clear()
+    start = time.perf_counter()
+    for token in issued:
+        tokens.verify(token)
+    cold = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for token in issued:
+        tokens.verify(token)
+    warm = (time.perf_counter() - start) / count
+    print(f"verify       cold {cold * 1e6:.2f} us, cached {warm * 1e6:.2f} us per token")
+
+
+async def bench_me(client: httpx.AsyncClient, token_list: List[str], requests: int, concurrency: int) -> None:
+    counter = iter(range(requests))
+
+    async def worker():
+        for n in counter:
+            response = await client.get("/auth/me", headers={"Authorization": f"Bearer {token_list[n % len(token_list)]}"})
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    print(f"GET /auth/me {requests / (time.perf_counter() - start):>9.1f}/s")
+
+
+async def main(logins: int, concurrency: int) -> None:
+    password_hash = hash_password(PASSWORD)
+    now = datetime.now()
+    users_db.insert_many([
+        {"id": None, "name": f"Auth {i}", "email": f"auth{i}@example.com", "age": None,
+         "created_at": now, "password_hash": password_hash}
+        for i in range(logins)
+    ])
+    emails = [f"auth{i}@example.com" for i in range(logins)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await bench_logins(client, emails, concurrency)
+        bench_verify(10_000)
+        user_ids = list(users_db.rows)[:10]
+        await bench_me(client, [tokens.issue(user_id)[0] for user_id in user_ids], logins * 10, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency))
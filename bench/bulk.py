@@ -0,0 +1,44 @@
+"""Throughput of POST /products/bulk and /users/bulk with NDJSON bodies.
+
+Drives the ASGI app in-process, so the numbers cover parsing, validation
+and indexing but not the network. Run with `python -m bench.bulk`.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.main import app
+
+
+def ndjson(rows) -> bytes:
+    return b"\n".join(json.dumps(row).encode() for row in rows)
+
+
+async def post(client: httpx.AsyncClient, path: str, body: bytes, rows: int) -> None:
+    start = time.perf_counter()
+    response = await client.post(path, content=body, headers={"content-type": "application/x-ndjson"})
+    elapsed = time.perf_counter() - start
+    report = response.json()
+    print(f"{path:<16} {rows:>9} rows {elapsed:>7.2f}s {rows / elapsed:>10.0f} rows/s  created={report['created']}")
+
+
+async def main(rows: int) -> None:
+    products = ndjson(
+        {"name": f"Product {i}", "price": round(1 + (i % 50_000) / 100, 2), "description": f"Item number {i}", "in_stock": i % 3 != 0}
+        for i in range(rows)
+    )
+    users = ndjson({"name": f"User {i}", "email": f"user{i}@example.com", "age": i % 90} for i in range(rows))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await post(client, "/products/bulk", products, rows)
+        await post(client, "/users/bulk", users, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    asyncio.run(main(parser.parse_args().rows))
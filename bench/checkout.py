@@ -0,0 +1,188 @@
+"""Benchmark concurrent cart checkouts against a few popular products.
+
+Every cart holds one or two units of products drawn from a small set of
+"hot" products, so checkouts contend for the same stock and far more units
+are asked for than exist. Carts are created first; only the checkouts are
+timed. Afterwards the run is checked for overselling: for every product,
+units sold plus units left must equal the starting stock, and no stock
+level may be negative.
+
+`asgi` drives one process through httpx's ASGITransport; `processes` runs
+several workers on one SQLite file, the case where stock has to be
+reserved in storage rather than in memory.
+
+Run with `python -m bench.checkout --carts 2000 --concurrency 64`.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+async def _checkouts(client, cart_ids: List[int], concurrency: int) -> Tuple[Counter, float]:
+    """Check out every cart from `concurrency` clients; return status counts and seconds taken."""
+    statuses: Counter = Counter()
+    pending = iter(cart_ids)
+
+    async def worker():
+        for cart_id in pending:
+            statuses[(await client.post(f"/cart/{cart_id}/checkout")).status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses, time.perf_counter() - start
+
+
+async def _create_carts(client, user_id: int, product_ids: List[int], carts: int, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    cart_ids = []
+    for _ in range(carts):
+        lines = rng.sample(product_ids, rng.choice((1, 2)))
+        response = await client.post(
+            "/cart", params={"user_id": user_id},
+            json={"items": [{"product_id": pid, "quantity": rng.choice((1, 2))} for pid in lines]},
+        )
+        cart_ids.append(response.json()["cart_id"])
+    return cart_ids
+
+
+async def _seed(client, hot: int, stock: int) -> Tuple[int, List[int]]:
+    user = await client.post("/users", json={"name": "Checkout Bench", "email": f"checkout-{time.time_ns()}@example.com"})
+    product_ids = [
+        (await client.post("/products", json={"name": f"Hot {i}", "price": 9.99, "stock": stock})).json()["id"]
+        for i in range(hot)
+    ]
+    return user.json()["id"], product_ids
+
+
+def check(sold: Dict[int, int], left: Dict[int, int], stock: int) -> None:
+    for pid, units in left.items():
+        assert units >= 0, f"product {pid} has negative stock {units}"
+        assert sold.get(pid, 0) + units == stock, f"product {pid}: {sold.get(pid, 0)} sold + {units} left != {stock}"
+
+
+def _sold(orders) -> Counter:
+    sold: Counter = Counter()
+    for order in orders:
+        for item in order["items"]:
+            sold[item["product_id"]] += item["quantity"]
+    return sold
+
+
+def report(mode: str, statuses: Counter, seconds: float) -> None:
+    total = sum(statuses.values())
+    print(
+        f"{mode:<10} {total:>6} checkouts in {seconds:.2f}s = {total / seconds:>8.0f}/s  "
+        f"placed {statuses[201]}, out of stock {statuses[409]}, other {total - statuses[201] - statuses[409]}"
+    )
+
+
+def run_asgi(carts: int, concurrency: int, hot: int, stock: int) -> None:
+    import httpx
+    from app.main import app
+    from app.database import orders_db, products_db
+
+    async def main() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            user_id, product_ids = await _seed(client, hot, stock)
+            cart_ids = await _create_carts(client, user_id, product_ids, carts, 0)
+            statuses, seconds = await _checkouts(client, cart_ids, concurrency)
+        sold = _sold(order for order in orders_db if order.get("cart_id") in set(cart_ids))
+        check(sold, {pid: products_db.rows[pid]["stock"] for pid in product_ids}, stock)
+        report("asgi", statuses, seconds)
+
+    asyncio.run(main())
+
+
+def _use_sqlite(path: str) -> None:
+    os.environ.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=path)
+
+
+def seed_worker(path: str, hot: int, stock: int, queue) -> None:
+    _use_sqlite(path)
+    import httpx
+    from app.main import app
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            queue.put(await _seed(client, hot, stock))
+
+    asyncio.run(main())
+
+
+def process_worker(path: str, n: int, user_id: int, product_ids: List[int], carts: int, concurrency: int,
+                   queue, barrier) -> None:
+    _use_sqlite(path)
+    import httpx
+    from app.main import app
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            cart_ids = await _create_carts(client, user_id, product_ids, carts, n)
+            await asyncio.to_thread(barrier.wait)
+            start = time.perf_counter()
+            statuses, _ = await _checkouts(client, cart_ids, concurrency)
+            queue.put((statuses, start, time.perf_counter()))
+
+    asyncio.run(main())
+
+
+def run_processes(processes: int, carts: int, concurrency: int, hot: int, stock: int) -> None:
+    import sqlite3
+    from app.storage import loads
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "checkout.db")
+        queue = context.Queue()
+        seeder = context.Process(target=seed_worker, args=(path, hot, stock, queue))
+        seeder.start()
+        user_id, product_ids = queue.get()
+        seeder.join()
+
+        barrier = context.Barrier(processes)
+        workers = [
+            context.Process(
+                target=process_worker,
+                args=(path, n, user_id, product_ids, carts // processes, concurrency // processes or 1, queue, barrier),
+            )
+            for n in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        results = [queue.get() for _ in range(processes)]
+        for worker in workers:
+            worker.join()
+
+        db = sqlite3.connect(path)
+        sold = _sold(loads(data) for data, in db.execute("SELECT data FROM orders"))
+        left = {pid: loads(data)["stock"] for pid, data in db.execute("SELECT id, data FROM products")}
+        check(sold, left, stock)
+    statuses = sum((r[0] for r in results), Counter())
+    report(f"{processes} procs", statuses, max(r[2] for r in results) - min(r[1] for r in results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--hot", type=int, default=5, help="number of contended products")
+    parser.add_argument("--stock", type=int, default=300, help="starting units per product")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--mode", choices=["asgi", "processes", "both"], default="both")
+    args = parser.parse_args()
+    try:
+        if args.mode in ("asgi", "both"):
+            run_asgi(args.carts, args.concurrency, args.hot, args.stock)
+        if args.mode in ("processes", "both"):
+            run_processes(args.processes, args.carts, args.concurrency, args.hot, args.stock)
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,280 @@
+"""Load test every endpoint listed in endpoint_reference.json.
+
+For each dataset size the users and products tables are topped up to that
+many rows, then every endpoint is driven with `--requests` requests from
+`--concurrency` concurrent clients, either in-process through httpx's
+ASGITransport, over HTTP against uvicorn serving the app from a background
+thread, or both. Request bodies are generated from app/models.py, and path
+and id parameters point at seeded rows.
+
+Per endpoint it reports throughput and p50/p95/p99 latency, and writes
+everything to a JSON file (bench/results/endpoints-<commit>.json by
+default). Pass an earlier file with --baseline to print the change.
+
+Run with `python -m bench.endpoints --sizes 1000 100000`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from app.database import products_db, users_db
+from app.main import app
+from app.security import hash_password
+from bench.payloads import PASSWORD, model, payload
+
+REFERENCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "endpoint_reference.json")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SEED_BATCH = 10_000
+
+
+def load_endpoints(path: str = REFERENCE) -> List[Dict]:
+    """Endpoints of the reference file, with deletes moved to the end."""
+    with open(path) as f:
+        endpoints = json.load(f)["endpoints"]
+    return sorted(endpoints, key=lambda e: e["method"] == "DELETE")
+
+
+def seed(rows: int) -> None:
+    """Top the users and products tables up to `rows` rows each."""
+    now = datetime.now()
+    # One hash for every seeded user, as hashing each would dominate seeding.
+    password_hash = hash_password(PASSWORD)
+    while len(users_db) < rows:
+        start = len(users_db)
+        users_db.insert_many([
+            {
+                "id": None, "name": f"User {i}", "email": f"seed{i}-{rows}@example.com", "age": 30,
+                "created_at": now, "password_hash": password_hash,
+            }
+            for i in range(start, min(rows, start + SEED_BATCH))
+        ])
+    while len(products_db) < rows:
+        start = len(products_db)
+        products_db.insert_many([
+            {
+                "id": None,
+                "name": f"Product {i}",
+                "description": "A product",
+                "price": round(random.uniform(1, 500), 2),
+                "in_stock": i % 3 != 0,
+            }
+            for i in range(start, min(rows, start + SEED_BATCH))
+        ])
+
+
+def _existing(table, n: int, field: str | None = None) -> int:
+    """Id of an existing row, spread over the table by `n`, that has `field` if given."""
+    ids = table._order
+    while True:
+        row_id = ids[(n * 7919) % len(ids)]
+        if row_id in table.rows and (field is None or table.rows[row_id].get(field) is not None):
+            return row_id
+        n += 1
+
+
+class RequestFactory:
+    """Builds the n-th request for an endpoint of the reference file."""
+
+    def __init__(self, endpoint: Dict):
+        self.endpoint = endpoint
+        body = endpoint["request_body"]
+        self.model = model(body["model"]) if body else None
+        self.deletes = endpoint["method"] == "DELETE"
+        self.victims: List[int] = []
+
+    def prepare(self, count: int) -> None:
+        # Deletes each need a distinct live row; take them from the newest.
+        if self.deletes:
+            self.victims = list(reversed([row_id for row_id in users_db._order[-count * 2:] if row_id in users_db.rows]))
+
+    def _param(self, name: str, n: int) -> int:
+        if name == "user_id":
+            if self.deletes and self.victims:
+                return self.victims.pop()
+            return _existing(users_db, n)
+        if name == "product_id":
+            return _existing(products_db, n)
+        return 1
+
+    def build(self, n: int) -> Tuple[str, str, Dict, Any]:
+        path = self.endpoint["path"]
+        for param in self.endpoint["path_params"]:
+            path = path.replace("{" + param["name"] + "}", str(self._param(param["name"], n)))
+        params = {
+            param["name"]: self._param(param["name"], n)
+            for param in self.endpoint["query_params"]
+            if param["name"].endswith("_id")
+        }
+        body = None
+        if self.model is not None:
+            body = payload(self.model, n, len(products_db))
+            if "user_id" in body:
+                body["user_id"] = _existing(users_db, n)
+            if "stock" in body:
+                # Plenty, so orders for the products created never run out.
+                body["stock"] = 1_000_000
+            if self.endpoint["path"] == "/auth/login":
+                # Only users with a password can log in.
+                body["email"] = users_db.rows[_existing(users_db, n, "password_hash")]["email"]
+        return self.endpoint["method"], path, params, body
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def drive(client: httpx.AsyncClient, endpoint: Dict, requests: int, concurrency: int) -> Dict:
+    """Send `requests` requests to one endpoint and summarize the latencies."""
+    factory = RequestFactory(endpoint)
+    factory.prepare(requests)
+    counter = iter(range(requests))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker():
+        for n in counter:
+            method, path, params, body = factory.build(n)
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "method": endpoint["method"],
+        "path": endpoint["path"],
+        "requests": requests,
+        "errors": requests - statuses[endpoint["status_code"]],
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_asgi(endpoints: List[Dict], requests: int, concurrency: int) -> List[Dict]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return [await drive(client, endpoint, requests, concurrency) for endpoint in endpoints]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(endpoints: List[Dict], requests: int, concurrency: int) -> List[Dict]:
+    """Serve the app with uvicorn in a background thread and drive it over HTTP."""
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return [await drive(client, endpoint, requests, concurrency) for endpoint in endpoints]
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(REFERENCE),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict], baseline_path: str) -> None:
+    """Print the change in throughput and p50/p99 against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = {
+            (r["mode"], r["rows"], r["method"], r["path"]): r for r in json.load(f)["results"]
+        }
+    print(f"\nvs {baseline_path}")
+    print(f"{'mode':>7} {'rows':>8} {'endpoint':<52} {'rps':>8} {'p50':>8} {'p99':>8}")
+    for r in results:
+        old = baseline.get((r["mode"], r["rows"], r["method"], r["path"]))
+        if old is None:
+            continue
+
+        def change(field: str) -> str:
+            return f"{(r[field] / old[field] - 1) * 100:+.0f}%" if old[field] else "n/a"
+        print(
+            f"{r['mode']:>7} {r['rows']:>8} {r['method'] + ' ' + r['path']:<52} "
+            f"{change('throughput_rps'):>8} {change('p50_ms'):>8} {change('p99_ms'):>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn", "both"], default="asgi")
+    parser.add_argument("--output", help="results file (default bench/results/endpoints-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    endpoints = load_endpoints()
+    modes = ["asgi", "uvicorn"] if args.mode == "both" else [args.mode]
+    runners = {"asgi": run_asgi, "uvicorn": run_uvicorn}
+    results: List[Dict] = []
+    print(f"{'mode':>7} {'rows':>8} {'endpoint':<52} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for rows in sorted(args.sizes):
+        seed(rows)
+        for mode in modes:
+            for r in asyncio.run(runners[mode](endpoints, args.requests, args.concurrency)):
+                r = {"mode": mode, "rows": rows, **r}
+                results.append(r)
+                print(
+                    f"{mode:>7} {rows:>8} {r['method'] + ' ' + r['path']:<52} {r['throughput_rps']:>9.1f} "
+                    f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>6}"
+                )
+
+    commit = _commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"endpoints-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nwrote {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
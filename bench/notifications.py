@@ -0,0 +1,92 @@
+"""Benchmark order placement with notifications delivered in the background.
+
+Orders are driven concurrently through httpx's ASGITransport while every
+channel's stand-in sink takes `--latency` seconds per batch and fails
+`--failure-rate` of them. The order rate should not depend on the sink's
+latency, which only shows in batch latency and, once the queues fill, in
+dropped notifications. After the run the queues get time to drain, then
+batch sizes, batch latency and delivery counters are reported per channel.
+
+Run with `python -m bench.notifications --orders 2000 --latency 0.05`.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+
+from app.database import products_db, save_notification_preferences, users_db
+from app.delivery import LATENCY_BUCKETS, dispatcher
+from app.main import app
+from app.models import NotificationType
+
+CHANNELS = [channel.value for channel in NotificationType]
+
+
+def _percentile(buckets, fraction: float) -> str:
+    """Upper bound of the latency bucket holding the given fraction of batches."""
+    target = fraction * sum(buckets)
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+        seen += count
+        if seen >= target:
+            return f"<= {bound}s"
+    return "-"
+
+
+async def main(orders: int, users: int, concurrency: int, latency: float, failure_rate: float) -> None:
+    for sink in dispatcher.sinks.values():
+        sink.latency = latency
+        sink.failure_rate = failure_rate
+    now = datetime.now()
+    inserted, _ = users_db.insert_many([
+        {"id": None, "name": f"Notify {i}", "email": f"notify{i}-{time.time_ns()}@example.com", "created_at": now}
+        for i in range(users)
+    ])
+    user_ids = [user["id"] for user in inserted]
+    # Spread the users over every channel, "none" included.
+    for n, user_id in enumerate(user_ids):
+        save_notification_preferences(user_id, {"order_updates": CHANNELS[n % len(CHANNELS)]})
+    product_id = products_db.insert_many([{"id": None, "name": "Notify", "price": 4.99, "in_stock": True}])[0][0]["id"]
+
+    dispatcher.start()
+    counter = iter(range(orders))
+
+    async def worker():
+        for n in counter:
+            body = {"user_id": user_ids[n % len(user_ids)], "items": [{"product_id": product_id, "quantity": 1}]}
+            response = await client.post("/orders", json=body)
+            assert response.status_code == 201, response.text
+            # An in-process request never suspends; yield like a server does
+            # between socket reads, so the delivery tasks get to run.
+            await asyncio.sleep(0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    depth = dispatcher.depth()
+    await dispatcher.stop(timeout=60)
+
+    print(f"POST /orders {orders / elapsed:>9.1f}/s with sink latency {latency * 1000:.0f} ms; {depth} queued at the end")
+    print(f"{'channel':<8} {'queued':>7} {'dropped':>8} {'delivered':>10} {'failed':>7} {'retries':>8} {'batch':>6} {'latency p50':>12} {'p99':>10}")
+    for channel, stats in sorted(dispatcher.stats.items()):
+        size = stats.delivered / stats.batches if stats.batches else 0
+        print(
+            f"{channel:<8} {stats.queued:>7} {stats.dropped:>8} {stats.delivered:>10} {stats.failed:>7} {stats.retries:>8} "
+            f"{size:>6.1f} {_percentile(stats.latency_buckets, 0.5):>12} {_percentile(stats.latency_buckets, 0.99):>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds each sink takes per batch")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of batches a sink fails")
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.users, args.concurrency, args.latency, args.failure_rate))
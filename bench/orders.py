@@ -0,0 +1,68 @@
+"""Per-request cost of create_order/create_cart as the catalog grows.
+
+Calls the route handlers directly so the numbers isolate product
+resolution and pricing from HTTP overhead. Run with `python -m bench.orders`.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from fastapi import Response
+
+from app.database import products_db, users_db
+from app.models import CartCreate, OrderCreate
+from app.routers.cart import create_cart
+from app.routers.orders import create_order
+
+
+def seed(catalog_size: int) -> None:
+    """Fill the products table up to `catalog_size` rows."""
+    for _ in range(catalog_size - len(products_db)):
+        product_id = products_db.next_id()
+        products_db.insert({
+            "id": product_id,
+            "name": f"Product {product_id}",
+            "price": round(random.uniform(1, 500), 2),
+            "description": None,
+            "in_stock": True,
+        })
+    if not users_db.get(1):
+        users_db.insert({"id": users_db.next_id(), "name": "Bench", "email": "bench@example.com", "age": None, "created_at": None})
+
+
+def bench(catalog_size: int, items: int, rounds: int) -> None:
+    seed(catalog_size)
+    ids = random.sample(range(1, catalog_size + 1), items)
+    order = OrderCreate(user_id=1, items=[{"product_id": pid, "quantity": 2} for pid in ids])
+    cart = CartCreate(items=[{"product_id": pid, "quantity": 2} for pid in ids])
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await create_order(order, Response(), None)
+        order_us = (time.perf_counter() - start) / rounds * 1e6
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await create_cart(cart, None)
+        cart_us = (time.perf_counter() - start) / rounds * 1e6
+        return order_us, cart_us
+
+    order_us, cart_us = asyncio.run(run())
+    print(f"{catalog_size:>10} {items:>6} {order_us:>14.1f} {cart_us:>13.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2_000)
+    args = parser.parse_args()
+    print(f"{'catalog':>10} {'items':>6} {'order us/req':>14} {'cart us/req':>13}")
+    for size in sorted(args.sizes):
+        bench(size, args.items, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
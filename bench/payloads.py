@@ -0,0 +1,101 @@
+"""Valid request payloads generated from the pydantic models in app/models.py.
+
+Values honour each field's length, range and pattern constraints, and vary
+with a sequence number `n` so unique fields (emails) do not collide. Fields
+named like `user_id` or `product_id` get an id between 1 and `max_id`, so
+seeded rows can be referenced.
+"""
+
+import itertools
+import types
+import typing
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+import app.models
+
+_serial = itertools.count()
+
+# Every generated password, so seeded users can log in with it.
+PASSWORD = "benchpassword"
+
+
+def model(name: str) -> type[BaseModel]:
+    """Look up a model of app/models.py by class name."""
+    return getattr(app.models, name)
+
+
+def _constraints(metadata: List[Any]) -> Dict[str, Any]:
+    found: Dict[str, Any] = {}
+    for item in metadata:
+        for attr in ("min_length", "max_length", "gt", "ge", "lt", "le", "pattern"):
+            value = getattr(item, attr, None)
+            if value is not None:
+                found[attr] = value
+    return found
+
+
+def _id(n: int, max_id: int) -> int:
+    return 1 + (n * 7919) % max(max_id, 1)
+
+
+def _text(name: str, n: int, c: Dict[str, Any]) -> str:
+    pattern = c.get("pattern") or ""
+    if "@" in pattern or name == "email":
+        return f"bench{next(_serial)}@example.com"
+    if pattern.startswith(r"^\d{5}"):
+        return f"{n % 100_000:05d}"
+    if "password" in name:
+        # Fixed, so password and confirm_password always match.
+        text = PASSWORD
+    else:
+        text = f"{name} {n}"
+    low, high = c.get("min_length", 1), c.get("max_length", 40)
+    return text.ljust(low, "x")[:high]
+
+
+def value(name: str, annotation: Any, metadata: List[Any], n: int, max_id: int) -> Any:
+    """Generate a valid value for one field."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+        origin = typing.get_origin(annotation)
+    c = _constraints(metadata)
+
+    if origin in (list, List):
+        (item,) = typing.get_args(annotation) or (str,)
+        count = max(c.get("min_length", 1), min(c.get("max_length", 3), 3))
+        return [value(name, item, [], n + i, max_id) for i in range(count)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return payload(annotation, n, max_id)
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        members = list(annotation)
+        return members[n % len(members)].value
+    if annotation is bool:
+        return True
+    if annotation is int:
+        if name.endswith("_id"):
+            return _id(n, max_id)
+        low = c["gt"] + 1 if "gt" in c else c.get("ge", 0)
+        high = c["lt"] - 1 if "lt" in c else c.get("le", low + 100)
+        return low + n % (high - low + 1)
+    if annotation is float:
+        low = c.get("gt", c.get("ge", 0))
+        high = c.get("lt", c.get("le", low + 1000))
+        return round(low + 1 + (n % 1000) * (high - low - 1) / 1000, 2)
+    if annotation is datetime:
+        return datetime.now().isoformat()
+    if annotation is dict:
+        return {}
+    return _text(name, n, c)
+
+
+def payload(model: type[BaseModel], n: int = 0, max_id: int = 1) -> Dict[str, Any]:
+    """Generate a JSON-ready body that validates against `model`."""
+    return {
+        name: value(name, field.annotation, field.metadata, n, max_id)
+        for name, field in model.model_fields.items()
+    }
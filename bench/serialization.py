@@ -0,0 +1,92 @@
+"""Per-request cost of list_users/list_products with and without FAST_JSON.
+
+Calls the route handlers directly and encodes their result the way FastAPI
+does, so the numbers isolate query and serialization cost from HTTP
+overhead. Run with `python -m bench.serialization`.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app import config
+from app.database import products_db, users_db
+from app.models import Product, User
+from app.routers.products import list_products
+from app.routers.users import list_users
+
+USERS_FIELD = create_model_field("Response_list_users", List[User], mode="serialization")
+PRODUCTS_FIELD = create_model_field("Response_list_products", List[Product], mode="serialization")
+
+
+def seed(rows: int) -> None:
+    """Fill the users and products tables up to `rows` rows each."""
+    now = datetime.now()
+    users_db.insert_many([
+        {"id": None, "name": f"User {i}", "email": f"user{i}@example.com", "age": 30, "created_at": now}
+        for i in range(len(users_db), rows)
+    ])
+    products_db.insert_many([
+        {
+            "id": None,
+            "name": f"Product {i}",
+            "description": "A product",
+            "price": round(random.uniform(1, 500), 2),
+            "in_stock": True,
+        }
+        for i in range(len(products_db), rows)
+    ])
+
+
+async def encode(result, field) -> bytes:
+    """Turn a handler result into response bytes, as FastAPI's route does."""
+    if isinstance(result, Response):
+        return result.body
+    content = await serialize_response(field=field, response_content=result, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def per_request_us(handler, field, limit: int, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = Response()
+        await encode(await handler(response, skip=0, limit=limit, search=None, prefix=False, rank=False, cursor=None), field)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def bench(limit: int, rounds: int) -> None:
+    async def run(fast: bool):
+        config.FAST_JSON = fast
+        users = await per_request_us(list_users, USERS_FIELD, limit, rounds)
+        products = await per_request_us(
+            lambda response, **kw: list_products(response, min_price=None, max_price=None, in_stock=None, **kw),
+            PRODUCTS_FIELD, limit, rounds,
+        )
+        return users, products
+
+    for fast in (False, True):
+        users_us, products_us = asyncio.run(run(fast))
+        print(f"{'on' if fast else 'off':>9} {limit:>6} {users_us:>14.1f} {products_us:>17.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2_000)
+    args = parser.parse_args()
+    seed(args.rows)
+    print(f"{'FAST_JSON':>9} {'limit':>6} {'users us/req':>14} {'products us/req':>17}")
+    bench(args.limit, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Stress test: concurrent creates and deletes must never reuse or lose ids.
+
+Three scenarios, each checked for duplicate ids, lost rows and index
+consistency; the script exits non-zero on any violation:
+
+* threads: many threads calling the Table API at once (threadpool endpoints)
+* asyncio: many concurrent requests through the ASGI app
+* processes: several worker processes sharing one SQLite file, each with
+  its own threads, compared against the file and each other afterwards
+
+Run with `python -m bench.stress`.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+def hammer(table, prefix: str, count: int, results: list) -> None:
+    """Create `count` users, deleting roughly a third of them along the way."""
+    created, deleted = [], []
+    for i in range(count):
+        row_id = table.next_id()
+        table.insert({"id": row_id, "name": f"{prefix} {i}", "email": f"{prefix}-{i}@example.com", "age": None, "created_at": None})
+        created.append(row_id)
+        if random.random() < 0.33:
+            victim = random.choice(created)
+            if table.delete(victim) is not None:
+                deleted.append(victim)
+    results.append((created, deleted))
+
+
+def check(table, results: list) -> None:
+    created = [row_id for batch, _ in results for row_id in batch]
+    deleted = {row_id for _, batch in results for row_id in batch}
+    duplicates = [row_id for row_id, n in Counter(created).items() if n > 1]
+    assert not duplicates, f"duplicate ids handed out: {duplicates[:10]}"
+    expected = set(created) - deleted
+    assert set(table.rows) == expected, f"{len(set(table.rows) ^ expected)} rows differ from expected"
+    assert list(table.ids_after()) == sorted(expected), "id order index out of sync"
+    emails = table.indexes["email"].entries
+    assert len(emails) == len(expected), "email index out of sync"
+
+
+def run_threads(threads: int, count: int) -> None:
+    from app.database import Table, write_lock
+    table = Table("users", lock=write_lock)
+    table.add_index("email", unique=True)
+    results: list = []
+    workers = [threading.Thread(target=hammer, args=(table, f"t{n}", count, results)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    check(table, results)
+    print(f"threads   {threads:>3} x {count} creates ok in {time.perf_counter() - start:.2f}s, {len(table)} rows left")
+
+
+def run_asyncio(tasks: int, count: int) -> None:
+    import httpx
+    from app.main import app
+    from app.database import users_db
+
+    async def client_task(client: httpx.AsyncClient, n: int, results: list) -> None:
+        created, deleted = [], []
+        for i in range(count):
+            response = await client.post("/users", json={"name": f"a{n} {i}", "email": f"a{n}-{i}@example.com"})
+            created.append(response.json()["id"])
+            if random.random() < 0.33:
+                victim = random.choice(created)
+                if (await client.delete(f"/users/{victim}")).status_code == 204:
+                    deleted.append(victim)
+        results.append((created, deleted))
+
+    async def main() -> None:
+        results: list = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(client_task(client, n, results) for n in range(tasks)))
+        check(users_db, results)
+        print(f"asyncio   {tasks:>3} x {count} creates ok in {time.perf_counter() - start:.2f}s, {len(users_db)} rows left")
+
+    asyncio.run(main())
+
+
+def process_worker(path: str, n: int, threads: int, count: int, queue, barrier) -> None:
+    os.environ.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=path, ID_BLOCK_SIZE="16")
+    from app.database import users_db, sync_tables
+    results: list = []
+    workers = [threading.Thread(target=hammer, args=(users_db, f"p{n}t{t}", count, results)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(("results", results))
+    # Once every worker has finished writing, catch up and report.
+    barrier.wait()
+    sync_tables()
+    queue.put(("rows", sorted(users_db.rows)))
+
+
+def run_processes(processes: int, threads: int, count: int) -> None:
+    import sqlite3
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stress.db")
+        queue = context.Queue()
+        barrier = context.Barrier(processes)
+        start = time.perf_counter()
+        workers = [context.Process(target=process_worker, args=(path, n, threads, count, queue, barrier)) for n in range(processes)]
+        for worker in workers:
+            worker.start()
+        messages = [queue.get() for _ in range(processes * 2)]
+        for worker in workers:
+            worker.join()
+        results = [batch for kind, payload in messages if kind == "results" for batch in payload]
+        views = [payload for kind, payload in messages if kind == "rows"]
+
+        created = [row_id for batch, _ in results for row_id in batch]
+        deleted = {row_id for _, batch in results for row_id in batch}
+        duplicates = [row_id for row_id, n in Counter(created).items() if n > 1]
+        assert not duplicates, f"duplicate ids across processes: {duplicates[:10]}"
+        expected = sorted(set(created) - deleted)
+        stored = [row_id for row_id, in sqlite3.connect(path).execute("SELECT id FROM users ORDER BY id")]
+        assert stored == expected, f"{len(set(stored) ^ set(expected))} stored rows differ from expected"
+        for view in views:
+            assert view == expected, "a worker's in-memory table diverged from storage"
+    print(f"processes {processes:>3} x {threads} threads x {count} creates ok in {time.perf_counter() - start:.2f}s, "
+          f"{len(expected)} rows left")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+    try:
+        run_threads(args.threads, args.count)
+        run_asyncio(args.threads, args.count // 5)
+        run_processes(args.processes, args.threads // 4 or 1, args.count // 5)
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,114 @@
+"""Cost of validating request bodies, from a dict and from raw JSON bytes.
+
+For each request model, a generated body is validated the way FastAPI does
+by default (json.loads, then validation of the resulting dicts) and the
+way RAW_JSON_BODIES does (pydantic-core straight from the bytes). Orders
+and carts carry `--items` lines. Then POST /orders with an order of that
+size is driven through httpx's ASGITransport with RAW_JSON_BODIES off and
+on, to show what is left of the difference end to end.
+
+Run with `python -m bench.validation --items 50`.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Callable
+
+import httpx
+from starlette.routing import request_response
+
+from app import config
+from app.database import products_db, users_db
+from app.main import app
+from app.models import CartItem, OrderItem
+from app.validation import JSONBodyRoute, request_adapter
+from bench.payloads import model, payload
+
+MODELS = [
+    "OrderCreate", "CartCreate", "CartUpdate", "UserCreate", "ProductCreate",
+    "AddressCreate", "ReviewCreate", "RegisterRequest", "LoginRequest",
+]
+BATCH = 50
+
+
+def body(name: str, items: int) -> bytes:
+    data = payload(model(name), 0, items)
+    if name == "OrderCreate":
+        data["items"] = [payload(OrderItem, i, items) for i in range(items)]
+    elif name == "CartCreate":
+        data["items"] = [payload(CartItem, i, items) for i in range(items)]
+    return json.dumps(data).encode()
+
+
+def per_call_us(call: Callable[[], object], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def bench_models(items: int, rounds: int) -> None:
+    print(f"{'model':<16} {'bytes':>6} {'dict us':>9} {'raw us':>9} {'saved':>6}")
+    for name in MODELS:
+        adapter = request_adapter(model(name))
+        raw = body(name, items)
+        adapter.validate_json(raw)
+        from_dict = per_call_us(lambda: adapter.validate_python(json.loads(raw)), rounds)
+        from_bytes = per_call_us(lambda: adapter.validate_json(raw), rounds)
+        print(f"{name:<16} {len(raw):>6} {from_dict:>9.1f} {from_bytes:>9.1f} {1 - from_bytes / from_dict:>6.0%}")
+
+
+def set_raw_bodies(enabled: bool) -> None:
+    """Switch RAW_JSON_BODIES and rebuild the route handlers that read it."""
+    config.RAW_JSON_BODIES = enabled
+    for route in app.routes:
+        if isinstance(route, JSONBodyRoute):
+            route.app = request_response(route.get_route_handler())
+
+
+async def bench_endpoint(items: int, batches: int) -> None:
+    now = datetime.now()
+    if not users_db.rows:
+        users_db.insert({"id": users_db.next_id(), "name": "Bench", "email": "validation@example.com", "created_at": now})
+    products_db.insert_many([
+        {"id": None, "name": f"Product {i}", "price": 9.99, "in_stock": True} for i in range(len(products_db), items)
+    ])
+    data = json.loads(body("OrderCreate", items))
+    data["user_id"] = next(iter(users_db.rows))
+    raw = json.dumps(data).encode()
+    headers = {"content-type": "application/json"}
+
+    # Order handling costs far more than validation and varies as the tables
+    # grow, so the two modes alternate in small batches and the best batch
+    # of each is reported.
+    best = {False: float("inf"), True: float("inf")}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(batches):
+            for enabled in (False, True):
+                set_raw_bodies(enabled)
+                start = time.perf_counter()
+                for _ in range(BATCH):
+                    response = await client.post("/orders", content=raw, headers=headers)
+                    assert response.status_code == 201, response.text
+                best[enabled] = min(best[enabled], (time.perf_counter() - start) / BATCH * 1e6)
+    for enabled in (False, True):
+        print(f"POST /orders with {items} items, RAW_JSON_BODIES {'on ' if enabled else 'off'}: {best[enabled]:.0f} us/request")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50, help="lines per order and cart")
+    parser.add_argument("--rounds", type=int, default=5_000)
+    parser.add_argument("--batches", type=int, default=20, help=f"batches of {BATCH} orders per mode")
+    args = parser.parse_args()
+    bench_models(args.items, args.rounds)
+    print()
+    asyncio.run(bench_endpoint(args.items, args.batches))
+
+
+if __name__ == "__main__":
+    main()
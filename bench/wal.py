@@ -0,0 +1,69 @@
+"""Write overhead and recovery time of the write-ahead log storage.
+
+Inserts and updates rows through a Table backed by MemoryStorage and by
+LogStorage, then times recovering the logged table from disk, both from
+the log alone and from a snapshot. Run with `python -m bench.wal`.
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from typing import Tuple
+
+from app.database import Table
+from app.storage import LogStorage, MemoryStorage
+
+
+def make_table(storage) -> Table:
+    table = Table("users", storage=storage)
+    table.add_index("email", unique=True)
+    table.open()
+    return table
+
+
+def write(table: Table, rows: int) -> float:
+    """Insert `rows` users one at a time, then update each; return seconds."""
+    start = time.perf_counter()
+    for i in range(rows):
+        table.insert({"id": table.next_id(), "name": f"User {i}", "email": f"user{i}@example.com", "age": 30, "created_at": datetime.now()})
+    for row_id in range(1, rows + 1):
+        table.update(row_id, {"age": 31})
+    return time.perf_counter() - start
+
+
+def recover(directory: str) -> Tuple[float, LogStorage]:
+    """Open the log in `directory` and load its table; return seconds and the open storage."""
+    start = time.perf_counter()
+    storage = LogStorage(directory)
+    table = make_table(storage)
+    elapsed = time.perf_counter() - start
+    assert len(table) > 0
+    return elapsed, storage
+
+
+def main(rows: int) -> None:
+    ops = rows * 2
+    memory = write(make_table(MemoryStorage()), rows)
+    print(f"memory writes   {ops:>9} ops {memory:>7.2f}s {ops / memory:>10.0f} ops/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = LogStorage(directory, snapshot_every=ops + 1)
+        logged = write(make_table(storage), rows)
+        # The directory stays locked while a LogStorage has it open.
+        storage.close()
+        print(f"wal writes      {ops:>9} ops {logged:>7.2f}s {ops / logged:>10.0f} ops/s  "
+              f"(+{(logged - memory) / ops * 1e6:.1f}us/op)")
+        seconds, storage = recover(directory)
+        print(f"recover (log)   {ops:>9} records {seconds:>7.2f}s")
+        storage.snapshot(wait=True)
+        storage.close()
+        seconds, storage = recover(directory)
+        storage.close()
+        print(f"recover (snap)  {rows:>9} rows {seconds:>7.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    main(parser.parse_args().rows)
@@ -0,0 +1,161 @@
+"""Production entry point: prefork uvicorn workers on uvloop and httptools.
+
+The app is imported, its tables loaded from storage and its routes,
+schemas and OpenAPI document warmed once, in this process. Workers are then
+forked from it and share all of that copy-on-write, so each one serves
+within milliseconds instead of importing and loading everything again.
+Import, warm-up and per-worker startup times are logged on every boot.
+
+More than one worker needs shared storage (STORAGE_BACKEND=sqlite); the
+memory and WAL backends keep data in a single process, so they default to
+one worker. Workers that die are
+replaced; SIGINT or SIGTERM shuts all of them down gracefully.
+
+Run with `python serve.py --workers 4`.
+"""
+
+import time
+
+BOOT = time.perf_counter()
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import gc  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import signal  # noqa: E402
+import socket  # noqa: E402
+import sys  # noqa: E402
+
+import uvicorn  # noqa: E402
+
+logger = logging.getLogger("serve")
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f} ms"
+
+
+class Server(uvicorn.Server):
+    """uvicorn Server that logs how long after `started_at` it began serving."""
+
+    def __init__(self, config: uvicorn.Config, started_at: float):
+        super().__init__(config)
+        self.started_at = started_at
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets)
+        logger.info("worker serving %s after it started", _ms(time.perf_counter() - self.started_at))
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(config: uvicorn.Config, sock: socket.socket) -> None:
+    from app.database import after_fork
+
+    started_at = time.perf_counter()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    after_fork()
+    Server(config, started_at).run(sockets=[sock])
+
+
+def _fork(config: uvicorn.Config, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(config, sock)
+        except BaseException:
+            logger.exception("worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(config: uvicorn.Config, sock: socket.socket, workers: int) -> None:
+    """Fork `workers` workers, replace any that die, and stop them all on SIGINT/SIGTERM."""
+    pids = {_fork(config, sock) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        pids.discard(pid)
+        if not stopping:
+            logger.warning("worker %d exited with status %d; starting another", pid, os.waitstatus_to_exitcode(status))
+            pids.add(_fork(config, sock))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int,
+        help="worker processes (default $WEB_CONCURRENCY, else one per CPU with shared storage and one without)",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(process)d] %(message)s")
+
+    start = time.perf_counter()
+    from app.database import storage
+    from app.main import app, warm_up
+    imported = time.perf_counter()
+    if args.workers is None:
+        args.workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) if storage.shared else 1))
+    if args.workers > 1 and not storage.shared:
+        sys.exit("More than one worker needs STORAGE_BACKEND=sqlite; other backends keep data in one process.")
+
+    warmed = asyncio.run(warm_up())
+    failed = [f"{method} {path} -> {status}" for method, path, status in warmed if status >= 500]
+    if failed:
+        sys.exit(f"Warm-up failed: {', '.join(failed)}")
+    ready = time.perf_counter()
+    logger.info(
+        "app imported and tables loaded in %s, warmed in %s; ready %s after start (%.0f ms CPU)",
+        _ms(imported - start), _ms(ready - imported), _ms(ready - BOOT), time.process_time() * 1000,
+    )
+
+    config = uvicorn.Config(
+        app, loop="uvloop", http="httptools", lifespan="on", log_level=args.log_level,
+        access_log=args.access_log, backlog=args.backlog,
+    )
+    sock = _listen(args.host, args.port, args.backlog)
+    logger.info("listening on %s:%d with %d worker(s)", args.host, args.port, args.workers)
+    if args.workers == 1:
+        Server(config, time.perf_counter()).run(sockets=[sock])
+        return
+    storage.close()
+    # Keep the loaded objects out of the collector's reach, so collections in
+    # the workers do not write to (and so copy) the pages they share.
+    gc.collect()
+    gc.freeze()
+    supervise(config, sock, args.workers)
+
+
+if __name__ == "__main__":
+    main()
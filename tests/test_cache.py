@@ -0,0 +1,68 @@
+"""Product responses are cached with ETags and invalidated by writes."""
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def _product(name: str, **fields) -> int:
+    return client.post("/products", json={"name": name, "price": 5.0, **fields}).json()["id"]
+
+
+def _user() -> int:
+    email = f"{uuid.uuid4().hex}@example.com"
+    return client.post("/users", json={"name": "Reviewer", "email": email}).json()["id"]
+
+
+def test_stock_change_invalidates_the_detail_page():
+    product_id = _product("Cached", stock=2)
+    assert client.get(f"/products/{product_id}").headers["x-cache"] == "MISS"
+    assert client.get(f"/products/{product_id}").headers["x-cache"] == "HIT"
+
+    order = {"user_id": _user(), "items": [{"product_id": product_id, "quantity": 2}]}
+    assert client.post("/orders", json=order).status_code == 201
+    response = client.get(f"/products/{product_id}")
+    assert response.headers["x-cache"] == "MISS"
+    assert (response.json()["stock"], response.json()["in_stock"]) == (0, False)
+
+
+def test_review_invalidates_the_detail_page():
+    product_id = _product("Reviewed")
+    client.get(f"/products/{product_id}")
+    review = {"rating": 4, "title": "Fine", "comment": "Does the job well."}
+    response = client.post(f"/products/{product_id}/reviews", params={"user_id": _user()}, json=review)
+    assert response.status_code == 201
+    response = client.get(f"/products/{product_id}")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()["review_summary"]["review_count"] == 1
+
+
+def test_create_invalidates_the_list():
+    word = uuid.uuid4().hex[:12]
+    _product(f"{word} first")
+    page = client.get("/products", params={"search": word})
+    assert page.headers["x-cache"] == "MISS"
+    assert client.get("/products", params={"search": word}).headers["x-cache"] == "HIT"
+
+    _product(f"{word} second")
+    page = client.get("/products", params={"search": word})
+    assert page.headers["x-cache"] == "MISS"
+    assert [product["name"] for product in page.json()] == [f"{word} first", f"{word} second"]
+
+
+def test_if_none_match():
+    product_id = _product("Tagged", stock=5)
+    etag = client.get(f"/products/{product_id}").headers["etag"]
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    order = {"user_id": _user(), "items": [{"product_id": product_id, "quantity": 1}]}
+    client.post("/orders", json=order)
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
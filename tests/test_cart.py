@@ -0,0 +1,100 @@
+"""Cart PATCH operations and expiry of idle carts."""
+
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config
+from app.database import carts_db
+from app.main import app
+from app.routers.cart import sweep_expired_carts
+
+client = TestClient(app)
+_emails = itertools.count()
+
+
+def _user() -> int:
+    n = next(_emails)
+    return client.post("/users", json={"name": f"Shopper {n}", "email": f"shopper{n}@example.com"}).json()["id"]
+
+
+def _product(price: float) -> int:
+    return client.post("/products", json={"name": "Thing", "price": price}).json()["id"]
+
+
+def _cart(*lines) -> int:
+    items = [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines]
+    return client.post("/cart", params={"user_id": _user()}, json={"items": items}).json()["cart_id"]
+
+
+def _patch(cart_id: int, *operations, **fields):
+    return client.patch(f"/cart/{cart_id}", json={"operations": list(operations), **fields})
+
+
+def test_operations_reprice_touched_lines():
+    a, b, c = _product(0.1), _product(0.2), _product(19.99)
+    cart_id = _cart((a, 3), (b, 1))
+    assert client.get(f"/cart/{cart_id}").json()["total"] == 0.5
+
+    response = _patch(
+        cart_id,
+        {"op": "add", "product_id": a, "quantity": 2},
+        {"op": "set", "product_id": b, "quantity": 0},
+        {"op": "add", "product_id": c, "quantity": 1},
+        coupon_code="SAVE10",
+    )
+    assert response.status_code == 200
+    cart = response.json()
+    assert [(line["product_id"], line["quantity"], line["subtotal"]) for line in cart["items"]] == [(a, 5, 0.5), (c, 1, 19.99)]
+    assert cart["total"] == 20.49
+    assert cart["coupon_code"] == "SAVE10"
+
+    cart = _patch(cart_id, {"op": "remove", "product_id": c}, {"op": "set", "product_id": a, "quantity": 1}).json()
+    assert cart["items"] == [{"product_id": a, "quantity": 1, "price": 0.1, "subtotal": 0.1}]
+    assert cart["total"] == 0.1
+    assert cart["coupon_code"] == "SAVE10"
+
+
+@pytest.mark.parametrize("operation,status", [
+    ({"op": "add"}, 422),
+    ({"op": "set", "quantity": 101}, 422),
+    ({"op": "add", "quantity": 100}, 400),
+    ({"op": "remove", "missing": True}, 404),
+    ({"op": "add", "quantity": 1, "missing": True}, 404),
+])
+def test_failed_operation_changes_nothing(operation, status):
+    product_id = _product(1.0)
+    cart_id = _cart((product_id, 1))
+    before = client.get(f"/cart/{cart_id}").json()
+    target = 10**9 if operation.pop("missing", False) else product_id
+
+    response = _patch(cart_id, {"op": "add", "product_id": product_id, "quantity": 1}, {**operation, "product_id": target})
+    assert response.status_code == status
+    assert client.get(f"/cart/{cart_id}").json() == before
+
+
+def test_unknown_cart():
+    assert _patch(10**9, coupon_code="X").status_code == 404
+
+
+def test_sweep_deletes_idle_carts(monkeypatch):
+    product_id = _product(1.0)
+    idle, touched, fresh = _cart((product_id, 1)), _cart((product_id, 1)), _cart((product_id, 1))
+    long_ago = datetime.now() - timedelta(seconds=config.CART_TTL + 60)
+    for cart_id in (idle, touched):
+        carts_db.update(cart_id, {"updated_at": long_ago})
+    assert _patch(touched, {"op": "add", "product_id": product_id, "quantity": 1}).status_code == 200
+
+    monkeypatch.setattr(config, "CART_SWEEP_INTERVAL", 0)
+
+    async def sweep():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(sweep_expired_carts(), 0.05)
+
+    asyncio.run(sweep())
+    assert client.get(f"/cart/{idle}").status_code == 404
+    assert client.get(f"/cart/{touched}").status_code == 200
+    assert client.get(f"/cart/{fresh}").status_code == 200
@@ -0,0 +1,94 @@
+"""Cart checkout: stock reservation, ownership and empty carts."""
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+_emails = itertools.count()
+
+
+def _user() -> int:
+    n = next(_emails)
+    return client.post("/users", json={"name": f"Buyer {n}", "email": f"buyer{n}@example.com"}).json()["id"]
+
+
+def _product(**fields) -> int:
+    return client.post("/products", json={"name": "Widget", "price": 2.5, **fields}).json()["id"]
+
+
+def _cart(user_id: int, *lines) -> int:
+    items = [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines]
+    response = client.post("/cart", params={"user_id": user_id}, json={"items": items})
+    assert response.status_code == 201, response.text
+    return response.json()["cart_id"]
+
+
+def test_empty_cart_is_rejected():
+    user_id, product_id = _user(), _product(stock=5)
+    cart_id = _cart(user_id, (product_id, 2))
+    response = client.patch(f"/cart/{cart_id}", json={"operations": [{"op": "remove", "product_id": product_id}]})
+    assert response.json()["items"] == []
+
+    response = client.post(f"/cart/{cart_id}/checkout")
+    assert response.status_code == 409
+    assert client.get(f"/cart/{cart_id}").status_code == 200
+    assert client.get(f"/users/{user_id}/orders").json() == []
+    assert client.get(f"/products/{product_id}").json()["stock"] == 5
+
+
+def test_checkout_reserves_stock_and_deletes_cart():
+    user_id, product_id = _user(), _product(stock=3)
+    cart_id = _cart(user_id, (product_id, 3))
+
+    response = client.post(f"/cart/{cart_id}/checkout")
+    assert response.status_code == 201
+    order = response.json()
+    assert order["user_id"] == user_id
+    assert order["total"] == 7.5
+    assert order["products"][0]["stock"] == 3
+    product = client.get(f"/products/{product_id}").json()
+    assert (product["stock"], product["in_stock"]) == (0, False)
+    assert client.get(f"/cart/{cart_id}").status_code == 404
+
+    replay = client.post(f"/cart/{cart_id}/checkout")
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["order_id"] == order["order_id"]
+    assert client.get(f"/products/{product_id}").json()["stock"] == 0
+
+
+def test_short_line_reserves_nothing():
+    user_id, plenty, short = _user(), _product(stock=10), _product(stock=1)
+    cart_id = _cart(user_id, (plenty, 4), (short, 2))
+
+    response = client.post(f"/cart/{cart_id}/checkout")
+    assert response.status_code == 409
+    assert str(short) in response.json()["detail"]
+    assert client.get(f"/products/{plenty}").json()["stock"] == 10
+    assert client.get(f"/products/{short}").json()["stock"] == 1
+    assert client.get(f"/cart/{cart_id}").status_code == 200
+
+
+def test_concurrent_checkouts_never_oversell():
+    stock, carts = 5, 20
+    user_id, hot, unlimited = _user(), _product(stock=stock), _product()
+    cart_ids = [_cart(user_id, (hot, 1), (unlimited, 1)) for _ in range(carts)]
+
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(lambda cart_id: client.post(f"/cart/{cart_id}/checkout").status_code, cart_ids))
+
+    assert statuses.count(201) == stock
+    assert statuses.count(409) == carts - stock
+    product = client.get(f"/products/{hot}").json()
+    assert (product["stock"], product["in_stock"]) == (0, False)
+
+
+def test_checkout_for_another_user_is_forbidden():
+    owner, other, product_id = _user(), _user(), _product()
+    cart_id = _cart(owner, (product_id, 1))
+    assert client.post(f"/cart/{cart_id}/checkout", json={"user_id": other}).status_code == 403
+    assert client.post(f"/cart/{cart_id}/checkout", json={"user_id": owner}).status_code == 201
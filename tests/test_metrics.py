@@ -0,0 +1,28 @@
+"""Request metrics label responses served before routing with their route template."""
+
+from fastapi.testclient import TestClient
+
+from app.cache import CacheMiddleware
+from app.main import app
+
+client = TestClient(app)
+
+
+def _requests_total(method: str, route: str, status: int) -> int:
+    prefix = f'preman_http_requests_total{{method="{method}",route="{route}",status="{status}"}} '
+    lines = [line for line in client.get("/metrics").text.splitlines() if line.startswith(prefix)]
+    return int(lines[0][len(prefix):]) if lines else 0
+
+
+def test_cache_templates_are_route_paths():
+    cache = next(m for m in app.user_middleware if m.cls is CacheMiddleware)
+    paths = {route.path for route in app.router.routes}
+    assert {template for _, template, _ in cache.kwargs["routes"]} <= paths
+
+
+def test_cache_hits_are_labelled_with_the_route_template():
+    product_id = client.post("/products", json={"name": "Metered", "price": 3.0}).json()["id"]
+    before = _requests_total("GET", "/products/{product_id}", 200)
+    outcomes = [client.get(f"/products/{product_id}").headers["x-cache"] for _ in range(3)]
+    assert outcomes == ["MISS", "HIT", "HIT"]
+    assert _requests_total("GET", "/products/{product_id}", 200) - before == 3
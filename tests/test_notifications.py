@@ -0,0 +1,51 @@
+"""Fan-out of a topic to its subscribers through the preferences' channel index."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config
+from app.database import get_subscriber_ids
+from app.delivery import dispatcher
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "test-admin")
+    return {"X-Admin-Token": "test-admin"}
+
+
+@pytest.fixture
+def subscribers():
+    """Users on push, on the email default, opted out, and deleted."""
+    ids = [client.post("/users", json={"name": f"Sub {i}", "email": f"sub{i}@example.com"}).json()["id"] for i in range(4)]
+    client.post(f"/users/{ids[0]}/notifications/preferences", json={"promotions": "push"})
+    client.post(f"/users/{ids[2]}/notifications/preferences", json={"promotions": "none"})
+    client.post(f"/users/{ids[3]}/notifications/preferences", json={"promotions": "push"})
+    client.delete(f"/users/{ids[3]}")
+    yield ids
+    for user_id in ids:
+        client.delete(f"/users/{user_id}")
+
+
+def test_subscribers_by_channel(subscribers):
+    push, default, opted_out, deleted = subscribers
+    mine = set(subscribers)
+    assert [i for i in get_subscriber_ids("promotions", "push", "email") if i in mine] == [push]
+    assert [i for i in get_subscriber_ids("promotions", "email", "email") if i in mine] == [default]
+    assert [i for i in get_subscriber_ids("promotions", "none", "email") if i in mine] == [opted_out]
+
+
+def test_broadcast_queues_every_subscriber(subscribers, admin):
+    expected = sum(len(list(get_subscriber_ids("promotions", channel, "email"))) for channel in dispatcher.sinks)
+    before = sum(stats.queued for stats in dispatcher.stats.values())
+    response = client.post("/admin/notifications/promotions", json={"sale": "spring"}, headers=admin)
+    assert response.status_code == 200
+    assert response.json() == {"topic": "promotions", "queued": expected}
+    assert sum(stats.queued for stats in dispatcher.stats.values()) - before == expected
+
+
+def test_broadcast_unknown_topic(admin):
+    assert client.post("/admin/notifications/weather", json={}, headers=admin).status_code == 404
@@ -0,0 +1,73 @@
+"""Idempotency-Key replay and conflicts on order creation."""
+
+import itertools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+_emails = itertools.count()
+
+
+def _user() -> int:
+    n = next(_emails)
+    return client.post("/users", json={"name": f"Orderer {n}", "email": f"orderer{n}@example.com"}).json()["id"]
+
+
+def _product(**fields) -> int:
+    return client.post("/products", json={"name": "Gadget", "price": 4.0, **fields}).json()["id"]
+
+
+def _order(body: dict, key: str):
+    return client.post("/orders", json=body, headers={"Idempotency-Key": key})
+
+
+def test_same_key_replays_the_order():
+    user_id, product_id = _user(), _product(stock=5)
+    body, key = {"user_id": user_id, "items": [{"product_id": product_id, "quantity": 2}]}, str(uuid.uuid4())
+
+    first = _order(body, key)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    replay = _order(body, key)
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+
+    assert [o["order_id"] for o in client.get(f"/users/{user_id}/orders").json()] == [first.json()["order_id"]]
+    assert client.get(f"/products/{product_id}").json()["stock"] == 3
+
+
+def test_same_key_different_body_is_rejected():
+    user_id, product_id = _user(), _product(stock=5)
+    key = str(uuid.uuid4())
+    assert _order({"user_id": user_id, "items": [{"product_id": product_id, "quantity": 1}]}, key).status_code == 201
+
+    response = _order({"user_id": user_id, "items": [{"product_id": product_id, "quantity": 2}]}, key)
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Idempotency-Key was already used for a different order"
+    assert len(client.get(f"/users/{user_id}/orders").json()) == 1
+    assert client.get(f"/products/{product_id}").json()["stock"] == 4
+
+
+def test_without_key_every_request_is_a_new_order():
+    user_id, product_id = _user(), _product()
+    body = {"user_id": user_id, "items": [{"product_id": product_id, "quantity": 1}]}
+    ids = {client.post("/orders", json=body).json()["order_id"] for _ in range(2)}
+    assert len(ids) == 2
+
+
+def test_concurrent_retries_create_one_order():
+    user_id, product_id = _user(), _product(stock=10)
+    body, key = {"user_id": user_id, "items": [{"product_id": product_id, "quantity": 1}]}, str(uuid.uuid4())
+
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda _: _order(body, key), range(16)))
+
+    assert {r.status_code for r in responses} == {201}
+    assert len({r.json()["order_id"] for r in responses}) == 1
+    assert len(client.get(f"/users/{user_id}/orders").json()) == 1
+    assert client.get(f"/products/{product_id}").json()["stock"] == 9
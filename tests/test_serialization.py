@@ -0,0 +1,73 @@
+"""FAST_JSON responses must match what response_model returns, byte for byte."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config
+from app.cache import response_cache
+from app.database import orders_db, products_db
+from app.main import app
+
+client = TestClient(app)
+
+
+def _both(path: str, params: dict | None = None) -> tuple:
+    """The body of GET `path` with FAST_JSON off, then on."""
+    bodies = []
+    for fast in (False, True):
+        # Product reads are cached; each mode must render its own response.
+        response_cache.clear()
+        config.FAST_JSON = fast
+        try:
+            response = client.get(path, params=params)
+        finally:
+            config.FAST_JSON = False
+        assert response.status_code == 200, response.text
+        bodies.append(response.content)
+    return tuple(bodies)
+
+
+@pytest.fixture
+def sparse_product():
+    """A product stored without its optional fields, keys out of model order."""
+    product_id = products_db.next_id()
+    products_db.insert({"price": 12.5, "name": "Sparse", "id": product_id, "in_stock": True})
+    yield products_db.get(product_id)
+    products_db.delete(product_id)
+
+
+def test_product_missing_optional_fields(sparse_product):
+    product_id = sparse_product["id"]
+    slow, fast = _both(f"/products/{product_id}")
+    assert fast == slow
+    assert b'"stock":null' in fast
+
+
+def test_product_list_missing_optional_fields(sparse_product):
+    slow, fast = _both("/products", {"min_price": 12.5, "max_price": 12.5})
+    assert fast == slow
+    assert b"Sparse" in fast
+
+
+def test_order_with_nested_sparse_product(sparse_product):
+    order_id = orders_db.next_id()
+    orders_db.insert({
+        "created_at": "2026-01-01T00:00:00", "total": 12.5, "user_id": 1, "order_id": order_id,
+        "products": [dict(sparse_product)],
+    })
+    try:
+        slow, fast = _both(f"/orders/{order_id}")
+    finally:
+        orders_db.delete(order_id)
+    assert fast == slow
+
+
+def test_export_line_matches_response_model(sparse_product):
+    product_id = sparse_product["id"]
+    slow, _ = _both("/products", {"min_price": 12.5, "max_price": 12.5})
+    expected = next(item for item in json.loads(slow) if item["id"] == product_id)
+    lines = client.get("/products/export").content.splitlines()
+    exported = next(row for row in map(json.loads, lines) if row["id"] == product_id)
+    assert list(exported.items()) == list(expected.items())
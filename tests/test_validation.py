@@ -0,0 +1,58 @@
+"""422 bodies from raw-bytes validation must match FastAPI's own."""
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import config
+from app.models import OrderCreate, UserCreate
+from app.validation import JSONBodyRoute
+
+BODIES = [
+    b'{"name": "A", ',
+    b"[1, 2]",
+    b'"text"',
+    b"3",
+    b"null",
+    b'{"name": 1, "email": "x"}',
+    b'{"name": "A", "email": "a@example.com", "age": "old"}',
+]
+
+ORDER_BODIES = [
+    b'{"user_id": 1, "items": []}',
+    b'{"user_id": 1, "items": [{"product_id": 0, "quantity": 1}], "shipping_address": {"zip_code": "x"}}',
+    b'{"user_id": 1, "items": {"product_id": 1}}',
+    b'{"user_id": 1, "items": [1, {"product_id": 1}]}',
+]
+
+
+def _client(raw: bool, monkeypatch) -> TestClient:
+    """A client for an app whose routes were built with RAW_JSON_BODIES set to `raw`."""
+    monkeypatch.setattr(config, "RAW_JSON_BODIES", raw)
+    router = APIRouter(route_class=JSONBodyRoute)
+
+    @router.post("/users")
+    async def create_user(user: UserCreate):
+        return user
+
+    @router.post("/orders")
+    async def create_order(order: OrderCreate):
+        return order
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    return _client(False, monkeypatch), _client(True, monkeypatch)
+
+
+@pytest.mark.parametrize("path,body", [("/users", body) for body in BODIES] + [("/orders", body) for body in ORDER_BODIES])
+def test_errors_match_fastapi(clients, path, body):
+    fastapi, raw = (
+        client.post(path, content=body, headers={"content-type": "application/json"}) for client in clients
+    )
+    assert raw.status_code == fastapi.status_code == 422
+    assert raw.json() == fastapi.json()
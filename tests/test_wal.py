@@ -0,0 +1,87 @@
+"""LogStorage: replaying the log after a restart, snapshots, torn tails and the directory lock."""
+
+import os
+
+import pytest
+
+from app.database import Table
+from app.storage import LogStorage
+
+
+def _open(directory, **options) -> Table:
+    table = Table("items", storage=LogStorage(str(directory), **options))
+    table.add_index("sku", unique=True)
+    table.open()
+    return table
+
+
+def _write(table: Table) -> None:
+    for i in range(5):
+        table.insert({"id": table.next_id(), "sku": f"sku-{i}", "stock": 3, "in_stock": True})
+    table.update(2, {"sku": "renamed"})
+    table.delete(4)
+    table.adjust("stock", {1: -3, 3: -1}, flag="in_stock")
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("wal-"))
+
+
+def test_replay_after_restart(tmp_path):
+    table = _open(tmp_path)
+    _write(table)
+    rows = {row["id"]: dict(row) for row in table}
+    table.storage.close()
+
+    reopened = _open(tmp_path)
+    assert {row["id"]: row for row in reopened} == rows
+    assert rows[1] == {"id": 1, "sku": "sku-0", "stock": 0, "in_stock": False}
+    assert reopened.find_one("sku", "renamed")["id"] == 2
+    assert reopened.next_id() == 6
+    reopened.storage.close()
+
+
+def test_recover_from_snapshot_and_tail(tmp_path):
+    table = _open(tmp_path)
+    _write(table)
+    table.storage.snapshot(wait=True)
+    table.update(5, {"stock": 9})
+    table.insert({"id": table.next_id(), "sku": "after", "stock": 1, "in_stock": True})
+    rows = {row["id"]: dict(row) for row in table}
+    table.storage.close()
+    assert os.path.exists(tmp_path / "snapshot.bin")
+    assert len(_segments(tmp_path)) == 1
+
+    reopened = _open(tmp_path)
+    assert {row["id"]: row for row in reopened} == rows
+    reopened.storage.close()
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    table = _open(tmp_path)
+    _write(table)
+    rows = {row["id"]: dict(row) for row in table}
+    table.storage.close()
+    segment = tmp_path / _segments(tmp_path)[-1]
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(LogStorage.HEADER.pack(100, 0) + b"torn")
+
+    reopened = _open(tmp_path)
+    assert {row["id"]: row for row in reopened} == rows
+    assert segment.stat().st_size == size
+    reopened.update(1, {"stock": 7})
+    reopened.storage.close()
+
+    again = _open(tmp_path)
+    assert again.get(1)["stock"] == 7
+    again.storage.close()
+
+
+def test_directory_is_locked_until_close(tmp_path):
+    storage = LogStorage(str(tmp_path))
+    with pytest.raises(RuntimeError, match="already open in another LogStorage"):
+        LogStorage(str(tmp_path))
+    storage.close()
+    storage.close()
+    LogStorage(str(tmp_path)).close()